@@ -1,18 +1,51 @@
 from classes import *
+from results import load_index, side_stats, heuristic_rates
+from evaluation import heuristic_by_name
+from stats import SearchStats
+from book import load_book
+from tablebase import load_tablebase
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import argparse
 import json
+import os
 import random
 
+H_NAMES = ["random_score", "sum_score", "sum_and_doubling", "doubling_aggresive", "sum_and_backline"]
+RESULTS_LOG = "statistics.jsonl"
+FSYNC_EVERY = 32  # tyle gier trafia na dysk jednym fsync
+
 
 def simulate_custom_game(heuristic_white, depth_white, heuristic_black, depth_black, max_turns=100,
-                         random_moves_count=1) -> tuple[int, int]:
+                         random_moves_count=1, game_class=Checkers, time_ms=None, seed=None,
+                         tablebase=None, book=None, memory_dir=None, stats=None) -> tuple[int, int]:
     """
     Symuluje grę między dwoma botami z możliwością losowego otwarcia.
 
     :param random_moves_count: Liczba pierwszych tur, w których boty grają losowo.
+    :param game_class: Reprezentacja planszy, np. Checkers albo BitboardCheckers.
+    :param time_ms: Limit czasu na ruch; wtedy depth_* to maksymalna głębokość iteracyjnego pogłębiania.
+    :param seed: Ziarno losowania (otwarcie i random_score), ta sama wartość daje tę samą grę.
+    :param tablebase: Baza końcówek (tablebase.Tablebase) wspólna dla obu botów, None - bez bazy.
+    :param book: Książka otwarć (book.OpeningBook); korzysta z niej tylko bot z heurystyką, dla której
+        ją zbudowano, None - bez książki.
+    :param memory_dir: Katalog tablic transpozycji; tablica każdej heurystyki jest wczytywana przed grą
+        i po niej scalana z plikiem (głębsze wpisy wygrywają), None - każda gra zaczyna od pustej tablicy.
+    :param stats: Słownik, w którym pod kluczami "white" i "black" lądują statystyki wyszukiwania
+        (stats.SearchStats) zsumowane po wszystkich ruchach danej strony, None - bez statystyk.
     """
-    game = Checkers()
-    algo_white = Algorithm(heuristic_white)
-    algo_black = Algorithm(heuristic_black)
+    if seed is not None:
+        random.seed(seed)
+    game = game_class()
+    collect = stats is not None
+    algo_white = Algorithm(heuristic_white, tablebase=tablebase, book=book, memory_dir=memory_dir, stats=collect)
+    algo_black = Algorithm(heuristic_black, tablebase=tablebase, book=book, memory_dir=memory_dir, stats=collect)
+    if collect:
+        stats["white"] = SearchStats()
+        stats["black"] = SearchStats()
+    if memory_dir is not None and algo_black.memory_file == algo_white.memory_file:
+        # ta sama heurystyka po obu stronach: wspólna tablica, zapisywana raz
+        algo_black.memory = algo_white.memory
 
     turn_counter = 1
 
@@ -20,9 +53,8 @@ def simulate_custom_game(heuristic_white, depth_white, heuristic_black, depth_bl
     def get_move(algo, depth, current_turn):
         # 1. Jeśli jesteśmy w fazie losowej -> Losuj
         if current_turn <= random_moves_count:
-            normal, attacking = game.possible_moves()
-            # Zasada bicia: jeśli są bicia (attacking), musimy z nich wybierać
-            valid_moves = attacking if attacking else normal
+            # legal_moves uwzględnia już obowiązek bicia, wielokrotne bicie to jeden ruch
+            valid_moves = game.legal_moves()
 
             if not valid_moves:
                 return None, None  # Brak ruchów
@@ -30,158 +62,203 @@ def simulate_custom_game(heuristic_white, depth_white, heuristic_black, depth_bl
             # Zwracamy losowy ruch i atrapę wyniku (np. 0), bo nie oceniamy planszy
             return 0, random.choice(valid_moves)
 
-        # 2. Jeśli faza losowa minęła -> Użyj Minmax
+        # 2. Jeśli faza losowa minęła -> Użyj Minmax (z limitem czasu, jeśli podany)
+        if time_ms is not None:
+            result = algo.search(game, time_ms=time_ms, max_depth=depth)
         else:
-            return algo.minmax(game, depth)
-
-    while turn_counter <= max_turns:
-        # --- RUCH BIAŁYCH ---
-        if game.color == Color.WHITE:
-            _, move = get_move(algo_white, depth_white, turn_counter)
+            result = algo.minmax(game, depth)
+        if collect and algo.stats is not None:
+            stats["white" if algo is algo_white else "black"].add(algo.stats)
+        return result
 
-            if move is None:
-                return 2, turn_counter
-
-            while True:
-                finished = game.turn(move[0], move[1], move[2])
-                if finished:
-                    break
-                # Kontynuacja bicia (też losowa jeśli wciąż trwa faza losowa)
+    try:
+        while turn_counter <= max_turns:
+            # --- RUCH BIAŁYCH ---
+            if game.color == Color.WHITE:
                 _, move = get_move(algo_white, depth_white, turn_counter)
-                if move is None: break
 
-        if not any(p < 0 for p in game.board):
-            return 1, turn_counter
+                if move is None:
+                    return 2, turn_counter
 
-        # --- RUCH CZARNYCH ---
-        if game.color == Color.BLACK:
-            _, move = get_move(algo_black, depth_black, turn_counter)
+                game.make_move(move, validate=False)
 
-            if move is None:
+            if game.is_won() == Color.WHITE:
                 return 1, turn_counter
 
-            while True:
-                finished = game.turn(move[0], move[1], move[2])
-                if finished:
-                    break
+            # --- RUCH CZARNYCH ---
+            if game.color == Color.BLACK:
                 _, move = get_move(algo_black, depth_black, turn_counter)
-                if move is None: break
 
-        if not any(p > 0 for p in game.board):
-            return 2, turn_counter
+                if move is None:
+                    return 1, turn_counter
 
-        turn_counter += 1
+                game.make_move(move, validate=False)
 
-    return 3, turn_counter
-
-
-def run_experiment():
-    h = Heuristics(0.3)
-    H_LIST = [h.random_score, h.sum_score, h.sum_and_doubling, h.doubling_aggresive, h.sum_and_backline]
-    H_NAMES = ["random_score", "sum_score", "sum_and_doubling", "doubling_aggresive", "sum_and_backline"]
-    data = {}
-    # Scenariusz:
-    # Białe: Grają agresywnie (doubling_aggresive), myślą płytko (EASY=1)
-    # Czarne: Grają klasycznie (sum_score), ale myślą głęboko (MEDIUM=3)
+            if game.is_won() == Color.BLACK:
+                return 2, turn_counter
 
-    counter = 0
-    for h1 in H_LIST:
-        for h2 in H_LIST:
+            turn_counter += 1
+
+        return 3, turn_counter
+    finally:
+        algo_white.save_memory()
+        if algo_black.memory is not algo_white.memory:
+            algo_black.save_memory()
+
+
+@lru_cache(maxsize=None)
+def worker_book(path):
+    # Książka otwarć wczytywana raz na proces roboczy, kolejne gry korzystają z tego samego mapowania
+    return None if path is None else load_book(path)
+
+
+@lru_cache(maxsize=None)
+def worker_tablebase(path):
+    # Baza końcówek tak samo: raz na proces roboczy
+    return None if path is None else load_tablebase(path)
+
+
+def play_game(job: tuple) -> dict:
+    # Uruchamiane w procesie roboczym: heurystyki odtwarzamy z nazw (wersje tablicowe z evaluation.py)
+    name_white, depth_white, name_black, depth_black, weight, seed, memory_dir, collect_stats, book_path, tablebase_path = job
+    stats = {} if collect_stats else None
+    result, turns = simulate_custom_game(
+        heuristic_white=heuristic_by_name(name_white, weight),
+        depth_white=depth_white,
+        heuristic_black=heuristic_by_name(name_black, weight),
+        depth_black=depth_black,
+        seed=seed,
+        tablebase=worker_tablebase(tablebase_path),
+        book=worker_book(book_path),
+        memory_dir=memory_dir,
+        stats=stats
+    )
+    winner_str = {1: "BIALE", 2: "CZARNE", 3: "REMIS"}[result]
+    record = {"winner": winner_str, "turns": turns, "heuristic_white": name_white,
+              "heuristic_black": name_black, "depth_black": depth_black, "depth_white": depth_white, "seed": seed}
+    if stats is not None:
+        record["stats_white"] = stats["white"].as_dict()
+        record["stats_black"] = stats["black"].as_dict()
+    return record
+
+
+def tournament_jobs(weight=0.3, games=10, base_seed=0, memory_dir=None, collect_stats=False, book_path=None,
+                    tablebase_path=None) -> list[tuple]:
+    # Każda gra dostaje własne ziarno zależne tylko od jej miejsca w turnieju
+    jobs = []
+    for name1 in H_NAMES:
+        for name2 in H_NAMES:
             for d1 in range(2,5):
                 for d2 in range(2,5):
-                    for _ in range(10):
-                        result, turns = simulate_custom_game(
-                            heuristic_white=h1,
-                            depth_white=d1,
-                            heuristic_black=h2,
-                            depth_black=d2
-                        )
-                        name1 = H_NAMES[H_LIST.index(h1)]
-                        name2 = H_NAMES[H_LIST.index(h2)]
-                        winner_str = {1: "BIALE", 2: "CZARNE", 3: "REMIS"}[result]
-                        data[counter] = {"winner": winner_str, "turns": turns, "heuristic_white": name1,
-                                         "heuristic_black": name2, "depth_black": d2, "depth_white": d1}
-                        counter += 1
-
-    file = open("statistics.json", "w")
-    file.write(json.dumps(data, indent=4))
+                    for _ in range(games):
+                        jobs.append((name1, d1, name2, d2, weight, base_seed * 1_000_000 + len(jobs),
+                                     memory_dir, collect_stats, book_path, tablebase_path))
+    return jobs
+
+
+def game_key(name_white, depth_white, name_black, depth_black, seed) -> tuple:
+    return name_white, name_black, depth_white, depth_black, seed
+
+
+class ResultLog:
+    """
+    Dziennik wyników w formacie JSON Lines: jedna gra na linię, dopisywana zaraz po jej końcu.
+
+    Zapisy trafiają na dysk (fsync) co FSYNC_EVERY gier i przy zamknięciu, więc po awarii
+    ginie najwyżej ostatnia paczka. Urwaną ostatnią linię obcina się przy ponownym otwarciu.
+    """
+    def __init__(self, path=RESULTS_LOG, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.records = self.load()
+        self.file = open(path, "a")
+        self.pending = 0
+
+    def load(self) -> dict:
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "rb") as file:
+            content = file.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            os.truncate(self.path, complete)
+        for line in content[:complete].splitlines():
+            record = json.loads(line)
+            records[game_key(record["heuristic_white"], record["depth_white"], record["heuristic_black"],
+                             record["depth_black"], record["seed"])] = record
+        return records
+
+    def __contains__(self, key) -> bool:
+        return key in self.records
+
+    def append(self, key, record):
+        self.records[key] = record
+        self.file.write(json.dumps(record) + "\n")
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_experiment(workers=None, base_seed=0, log_path=RESULTS_LOG, memory_dir=None, collect_stats=False, book_path=None,
+                   tablebase_path=None):
+    """
+    Rozgrywa turniej 5x5 heurystyk x 3x3 głębokości x 10 gier na puli procesów.
+
+    :param workers: Liczba procesów roboczych (domyślnie liczba rdzeni).
+    :param base_seed: Ziarno turnieju, ten sam turniej z tym samym ziarnem daje te same wyniki.
+    :param log_path: Dziennik gier; gry już w nim zapisane nie są rozgrywane ponownie.
+    :param memory_dir: Katalog trwałych tablic transpozycji, wspólny dla wszystkich procesów; każda gra
+        dokłada swoje wpisy do pliku, ale widzi tylko to, co zapisano przed jej startem. Wyniki zależą
+        wtedy od kolejności gier, więc to samo ziarno nie musi już dawać tych samych gier.
+    :param collect_stats: Zapisuje przy każdej grze statystyki wyszukiwania obu stron (stats_white, stats_black).
+    :param book_path: Plik książki otwarć (book.py), wczytywany raz w każdym procesie; grają z niej tylko
+        boty z heurystyką, dla której ją zbudowano.
+    :param tablebase_path: Plik bazy końcówek (tablebase.py), wczytywany raz w każdym procesie, wspólny dla obu stron.
+    """
+    jobs = tournament_jobs(weight=0.3, base_seed=base_seed, memory_dir=memory_dir, collect_stats=collect_stats,
+                           book_path=book_path, tablebase_path=tablebase_path)
+    keys = [game_key(*job[:4], job[5]) for job in jobs]
+    with ResultLog(log_path) as log:
+        pending = [(key, job) for key, job in zip(keys, jobs) if key not in log]
+        print(f"{len(jobs) - len(pending)} gier już w dzienniku, do rozegrania {len(pending)}")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(play_game, job): key for key, job in pending}
+            for future in as_completed(futures):
+                log.append(futures[future], future.result())
+        # statistics.json zostaje dla analizy, gry ponumerowane w kolejności turnieju
+        data = {counter: log.records[key] for counter, key in enumerate(keys)}
+
+    with open("statistics.json", "w") as file:
+        file.write(json.dumps(data, indent=4))
 
 
 def scrap_data(colour, depth, heuristic):
-    # Używamy konstrukcji 'with open', żeby plik bezpiecznie się zamknął po odczycie
+    # Indeks wyników liczony jest raz (i trzymany na dysku), kolejne wywołania tylko z niego czytają
     try:
-        with open("statistics.json", "r") as file:
-            data = json.load(file)
+        index = load_index("statistics.json")
     except FileNotFoundError:
         print("Nie znaleziono pliku statistics.json")
         return []
 
-    total_games = 0
-    total_wins = 0
-    total_loses = 0
-    total_draws = 0
-
-    # Sumy długości gier (do średniej)
-    sum_win_length = 0
-    sum_lose_length = 0
-    sum_draw_length = 0
-
-    # POPRAWKA 1: Używamy data.values(), żeby iterować po obiektach gier, a nie po kluczach "0", "1"...
-    games_list = data.values()
-
-    if colour == "B":
-        for game in games_list:
-            # Sprawdzamy czy parametry się zgadzają
-            if game.get("heuristic_black") == heuristic and game.get("depth_black") == depth:
-                total_games += 1
-                winner = game.get("winner")
-                turns = game.get("turns", 0)
-
-                if winner == "CZARNE":
-                    total_wins += 1
-                    sum_win_length += turns
-                elif winner == "REMIS":
-                    total_draws += 1
-                    sum_draw_length += turns
-                elif winner == "BIALE":
-                    total_loses += 1
-                    sum_lose_length += turns
-
-    elif colour == "W":
-        for game in games_list:
-            if game.get("heuristic_white") == heuristic and game.get("depth_white") == depth:
-                total_games += 1
-                winner = game.get("winner")
-                turns = game.get("turns", 0)
-
-                if winner == "BIALE":
-                    total_wins += 1
-                    sum_win_length += turns
-                elif winner == "REMIS":
-                    total_draws += 1
-                    sum_draw_length += turns
-                elif winner == "CZARNE":
-                    total_loses += 1
-                    sum_lose_length += turns
-
-    # POPRAWKA 2: Zabezpieczenie przed dzieleniem przez zero
-    if total_games == 0:
-        return [0, 0, 0, 0, 0, 0, 0.0, 0.0, 0.0]
-
-    avg_win_length = sum_win_length / total_wins if total_wins > 0 else 0
-    avg_lose_length = sum_lose_length / total_loses if total_loses > 0 else 0
-    avg_draw_length = sum_draw_length / total_draws if total_draws > 0 else 0
-
-    win_rate = total_wins / total_games
-    lose_rate = total_loses / total_games
-    draw_rate = total_draws / total_games
-
-    return [total_wins, total_loses, total_draws, avg_win_length, avg_lose_length, avg_draw_length, win_rate, lose_rate,
-            draw_rate]
+    return side_stats(index, colour, depth, heuristic)
 
 def do_data_magic():
-    H_NAMES = ["random_score", "sum_score", "sum_and_doubling", "doubling_aggresive", "sum_and_backline"]
-
     for heur in H_NAMES:
         print(f"Data for {heur} :")
         for depth in range(2,5):
@@ -200,35 +277,30 @@ def do_data_magic():
             print("_______________________________________")
 
 def black_or_white():
-    file = open("statistics.json", "r")
-    data = json.load(file)
-    H_NAMES = ["random_score", "sum_score", "sum_and_doubling", "doubling_aggresive", "sum_and_backline"]
-
+    # Gry heurystyki z samą sobą liczą się raz, remis liczy się tylko w grach z udziałem H
+    rates = heuristic_rates(load_index("statistics.json"))
 
     for H in H_NAMES:
-        wins = 0
-        loses = 0
-        draws = 0
-        counter = 0
-        for game in data.values():
-            if game.get("winner") == "CZARNE" and game.get("heuristic_black") == H:
-                wins += 1
-            if game.get("winner") == "REMIS" and game.get("heuristic_black") == H or game.get("heuristic_white") == H:
-                draws += 1
-            if game.get("winner") == "BIALE" and game.get("heuristic_white") == H:
-                wins += 1
-            if game.get("winner") == "CZARNE" and game.get("heuristic_white") == H:
-                loses += 1
-            if game.get("winner") == "BIALE" and game.get("heuristic_black") == H:
-                loses+=1
-            if game.get("heuristic_black") == H or game.get("heuristic_white") == H:
-                counter += 1
-        print(f"{H} RATES : WINS {wins/counter} LOSES {loses/counter} DRAW {draws/counter}")
+        wins, loses, draws = rates[H]
+        print(f"{H} RATES : WINS {wins} LOSES {loses} DRAW {draws}")
 
 if __name__ == "__main__":
-    H_NAMES = ["random_score", "sum_score", "sum_and_doubling", "doubling_aggresive", "sum_and_backline"]
+    parser = argparse.ArgumentParser(description="Turniej heurystyk i analiza statistics.json")
+    parser.add_argument("--experiment", action="store_true", help="rozegraj turniej przed analizą")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="liczba procesów roboczych")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno turnieju")
+    parser.add_argument("--memory", default=None, help="katalog trwałych tablic transpozycji")
+    parser.add_argument("--stats", action="store_true", help="zapisuj statystyki wyszukiwania każdej gry")
+    parser.add_argument("--book", default=None, help="plik książki otwarć (book.py)")
+    parser.add_argument("--tablebase", default=None, help="plik bazy końcówek (tablebase.py)")
+    args = parser.parse_args()
+    for path in (args.book, args.tablebase):
+        if path is not None and not os.path.exists(path):
+            parser.error(f"nie ma pliku {path}")
     print("start")
-    #run_experiment()
+    if args.experiment:
+        run_experiment(workers=args.workers, base_seed=args.seed, memory_dir=args.memory,
+                       collect_stats=args.stats, book_path=args.book, tablebase_path=args.tablebase)
     #do_data_magic()
     #print( scrap_data("W",3,H_NAMES[0] ) )
     black_or_white()
@@ -0,0 +1,188 @@
+from classes import *
+from bitboard import BitboardCheckers
+from parallel import ParallelSearch
+import os
+import random
+import time
+
+BACKENDS = {"list": Checkers, "bitboard": BitboardCheckers}
+
+
+def sample_positions(count: int = 200, seed: int = 0) -> list[tuple[list[int], Color, int]]:
+    # positions from random playouts, so kings and mid-capture states are covered too
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = Checkers()
+        for _ in range(rng.randint(0, 60)):
+            normal_moves, attacking_moves = game.possible_moves()
+            moves = attacking_moves if attacking_moves else normal_moves
+            if game.position_forced_by_attack >= 0:
+                moves = [move for move in moves if move[0] == game.position_forced_by_attack]
+            if not moves:
+                break
+            game.turn(*rng.choice(moves))
+        positions.append((game.board[:], game.color, game.position_forced_by_attack))
+    return positions
+
+
+def opening_positions() -> list[tuple[list[int], Color, int]]:
+    # every position after the random first move of each side, as arena games start
+    positions = []
+    game = Checkers()
+    for white_move in game.legal_moves():
+        undo_white = game.make_move(white_move)
+        for black_move in game.legal_moves():
+            undo_black = game.make_move(black_move)
+            positions.append((game.board[:], game.color, game.position_forced_by_attack))
+            game.unmake_move(undo_black)
+        game.unmake_move(undo_white)
+    return positions
+
+
+def bench_move_generation(positions, repeat: int = 20):
+    for name, backend in BACKENDS.items():
+        games = [backend(board[:], color, forced) for board, color, forced in positions]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for game in games:
+                game.possible_moves()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>9} possible_moves: {len(games)*repeat/elapsed:,.0f} calls/s")
+
+
+def bench_search(depth: int = Difficulty.MEDIUM.value):
+    heuristic = Heuristics(0.3)
+    for name, backend in BACKENDS.items():
+        algo = Algorithm(heuristic.sum_and_doubling)
+        start = time.perf_counter()
+        score, move = algo.minmax(backend(), depth)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>9} minmax depth {depth}: {elapsed:.3f}s, score {score}, move {move}, "
+              f"TT fill {algo.memory.fill():.2%}, hit rate {algo.memory.hit_rate():.2%}")
+
+
+def bench_ordering(positions, depth: int = 5):
+    # same depth with and without move ordering, the difference is the pruned part of the tree
+    heuristic = Heuristics(0.3)
+    for ordering in (False, True):
+        nodes = 0
+        start = time.perf_counter()
+        for board, color, forced in positions:
+            algo = Algorithm(heuristic.sum_and_doubling, ordering=ordering)
+            algo.search(BitboardCheckers(board[:], color, forced), max_depth=depth)
+            nodes += algo.nodes
+        elapsed = time.perf_counter() - start
+        print(f"ordering={ordering!s:>5} depth {depth}: {nodes:,} nodes, {elapsed:.2f}s")
+
+
+def bench_pvs(positions, depth: int = 5):
+    # plain alpha-beta against PVS at a fixed depth (scores must agree), then both inside iterative deepening
+    heuristic = Heuristics(0.3)
+    for pvs in (False, True):
+        fixed_nodes = deepening_nodes = 0
+        scores = []
+        for board, color, forced in positions:
+            algo = Algorithm(heuristic.sum_and_doubling, pvs=pvs)
+            scores.append(algo.minmax(BitboardCheckers(board[:], color, forced), depth)[0])
+            fixed_nodes += algo.nodes
+            algo = Algorithm(heuristic.sum_and_doubling, pvs=pvs)
+            algo.search(BitboardCheckers(board[:], color, forced), max_depth=depth)
+            deepening_nodes += algo.nodes
+        if pvs:
+            assert scores == plain_scores, "PVS changed a fixed-depth score"
+        plain_scores = scores
+        print(f"pvs={pvs!s:>5} depth {depth}: fixed depth {fixed_nodes:,} nodes, iterative deepening {deepening_nodes:,} nodes")
+
+
+def validating(backend: type) -> type:
+    # the backend with every move re-checked against legal_moves(), as before the trusted path existed
+    class Validating(backend):
+        def make_move(self, move: tuple, validate: bool = True) -> tuple:
+            return super().make_move(move, validate=True)
+    return Validating
+
+
+def bench_trusted_moves(depth: int = 7):
+    # the same fixed search from the starting position, with and without re-validating generated moves
+    heuristic = Heuristics(0.3)
+    for name, backend in BACKENDS.items():
+        times = []
+        for game_class in (validating(backend), backend):
+            algo = Algorithm(heuristic.sum_and_doubling)
+            start = time.perf_counter()
+            algo.minmax(game_class(), depth)
+            times.append(time.perf_counter() - start)
+        print(f"{name:>9} minmax depth {depth}: validated {times[0]:.3f}s, trusted {times[1]:.3f}s, "
+              f"speedup {times[0]/times[1]:.2f}x")
+
+
+def bench_quiescence(positions, depth: int = 3, reference_depth: int = 5):
+    # how far a shallow search lands from a deeper one, with and without quiescence
+    heuristic = Heuristics(0.3)
+    references = []
+    reference_nodes = 0
+    for board, color, forced in positions:
+        algo = Algorithm(heuristic.sum_and_doubling)
+        references.append(algo.minmax(BitboardCheckers(board[:], color, forced), reference_depth)[0])
+        reference_nodes += algo.nodes
+    print(f"depth {reference_depth} reference: {reference_nodes:,} nodes")
+    for quiescence_depth in (0, QUIESCENCE_DEPTH):
+        nodes = 0
+        errors = []
+        for (board, color, forced), reference in zip(positions, references):
+            algo = Algorithm(heuristic.sum_and_doubling, quiescence_depth=quiescence_depth)
+            score, _ = algo.minmax(BitboardCheckers(board[:], color, forced), depth)
+            nodes += algo.nodes
+            if abs(score) != math.inf and abs(reference) != math.inf:
+                errors.append(abs(score - reference))
+        print(f"depth {depth}, quiescence {quiescence_depth}: {nodes:,} nodes, "
+              f"mean distance to the depth {reference_depth} score {sum(errors)/len(errors):.3f}")
+
+
+def bench_evaluation(positions, depth: int = 5):
+    # leaves scored one by one, in NumPy batches of siblings, or from the incrementally kept terms; scores must agree
+    heuristic = Heuristics(0.3)
+    modes = {"scalar": dict(incremental=False, batch=False), "batched": dict(incremental=False, batch=True),
+             "incremental": dict(incremental=True, batch=False)}
+    for name in ("sum_score", "sum_and_backline", "sum_and_doubling", "doubling_aggresive"):
+        times = {}
+        results = []
+        for mode, options in modes.items():
+            start = time.perf_counter()
+            results.append([Algorithm(getattr(heuristic, name), **options).minmax(BitboardCheckers(board[:], color, forced), depth)
+                            for board, color, forced in positions])
+            times[mode] = time.perf_counter() - start
+        assert all(result == results[0] for result in results), "leaf evaluation mode changed a search result"
+        print(f"{name:>18} depth {depth}: " + ", ".join(f"{mode} {elapsed:.2f}s" for mode, elapsed in times.items()))
+
+
+def bench_parallel(positions, depth: int = 7):
+    # root splitting across 1, 2, 4, ... worker processes against the sequential search, moves must agree
+    heuristic = Heuristics(0.3)
+    start = time.perf_counter()
+    expected = [Algorithm(heuristic.sum_and_doubling).minmax(BitboardCheckers(board[:], color, forced), depth)[1]
+                for board, color, forced in positions]
+    sequential = time.perf_counter() - start
+    print(f"sequential depth {depth}: {sequential:.2f}s")
+    workers = 1
+    while workers <= os.cpu_count():
+        with ParallelSearch(heuristic.sum_and_doubling, workers) as parallel:
+            start = time.perf_counter()
+            moves = [parallel.minmax(BitboardCheckers(board[:], color, forced), depth)[1] for board, color, forced in positions]
+            elapsed = time.perf_counter() - start
+        assert moves == expected, "parallel search picked a different move"
+        print(f"{workers:>3} workers depth {depth}: {elapsed:.2f}s, speedup {sequential/elapsed:.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    positions = sample_positions()
+    bench_move_generation(positions)
+    bench_search()
+    bench_ordering(positions[:40])
+    bench_pvs(opening_positions())
+    bench_quiescence(positions[:60])
+    bench_trusted_moves()
+    bench_evaluation(positions[:40])
+    bench_parallel(opening_positions()[:8])
@@ -0,0 +1,273 @@
+from classes import (Checkers, Color, Direction, K_VALUE, NEIGHBOURS, OFF_BOARD, PIECE_INDEX, RAYS,
+                     Z_BLACK_TURN, Z_BOARD, Z_FORCED_POS)
+
+FULL = 0xFFFFFFFF
+MOVE_ORDER = [Direction.UP_L, Direction.UP_R, Direction.DOWN_L, Direction.DOWN_R]
+
+
+def _build_tables() -> tuple[dict, dict, dict]:
+    # For every direction group the squares by the index shift of a single step,
+    # so a whole set of pieces can be moved with one shift per group.
+    steps = {}
+    ray_masks = {}
+    ray_distance = {}
+    for direction in MOVE_ORDER:
+        groups = {}
+        for position, neighbour in enumerate(NEIGHBOURS[direction]):
+            if neighbour != OFF_BOARD:
+                groups[neighbour - position] = groups.get(neighbour - position, 0) | 1 << position
+        steps[direction] = tuple(groups.items())
+        ray_masks[direction] = [sum(1 << square for square in ray) for ray in RAYS[direction]]
+        ray_distance[direction] = [{square: distance for distance, square in enumerate(ray, 1)} for ray in RAYS[direction]]
+    return steps, ray_masks, ray_distance
+
+STEPS, RAY_MASKS, RAY_DISTANCE = _build_tables()
+
+
+def shift_step(bits: int, direction: Direction) -> int:
+    """Squares reached by moving every set bit one step in `direction`."""
+    result = 0
+    for delta, mask in STEPS[direction]:
+        if delta > 0:
+            result |= (bits & mask) << delta
+        else:
+            result |= (bits & mask) >> -delta
+    return result
+
+
+def step_sources(targets: int, direction: Direction) -> int:
+    """Squares whose single step in `direction` lands on one of `targets`."""
+    result = 0
+    for delta, mask in STEPS[direction]:
+        if delta > 0:
+            result |= mask & (targets >> delta)
+        else:
+            result |= mask & (targets << -delta)
+    return result
+
+
+def iterate_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def nearest_on_ray(blockers: int, direction: Direction) -> int:
+    # rays going up run towards lower indices, so the closest blocker is the highest bit
+    if direction in (Direction.UP_L, Direction.UP_R):
+        return blockers.bit_length() - 1
+    return (blockers & -blockers).bit_length() - 1
+
+
+class BitboardCheckers(Checkers):
+    """
+    Checkers position stored as four 32-bit masks (white men, white kings, black men, black kings).
+
+    Bit `i` stands for board index `i`, so moves, `turn` and `position_forced_by_attack`
+    use exactly the same notation as the list based `Checkers`. `board` is rebuilt from the
+    masks on every read and is meant for read-only consumers such as the heuristics.
+    """
+    def __init__(self, board: list[int] | None = None, color = Color.WHITE, position_forced_by_attack = -1):
+        self.white_men = self.white_kings = self.black_men = self.black_kings = 0
+        super().__init__(board, color, position_forced_by_attack)
+
+    @property
+    def board(self) -> list[int]:
+        board = [0]*32
+        for masks, value in ((self.white_men, 1), (self.white_kings, K_VALUE),
+                             (self.black_men, -1), (self.black_kings, -K_VALUE)):
+            for position in iterate_bits(masks):
+                board[position] = value
+        return board
+
+    @board.setter
+    def board(self, board: list[int]):
+        self.white_men = self.white_kings = self.black_men = self.black_kings = 0
+        for position, piece in enumerate(board):
+            if piece == 1:
+                self.white_men |= 1 << position
+            elif piece == K_VALUE:
+                self.white_kings |= 1 << position
+            elif piece == -1:
+                self.black_men |= 1 << position
+            elif piece == -K_VALUE:
+                self.black_kings |= 1 << position
+
+    def copy(self) -> 'BitboardCheckers':
+        game = BitboardCheckers.__new__(BitboardCheckers)
+        game.white_men = self.white_men
+        game.white_kings = self.white_kings
+        game.black_men = self.black_men
+        game.black_kings = self.black_kings
+        game.color = self.color
+        game.position_forced_by_attack = self.position_forced_by_attack
+        game.hash = self.hash
+        game.square_tables = self.square_tables[:]
+        game.set_terms(self.get_terms())
+        return game
+
+    def make_hop(self, position: int, direction: Direction, distance: int) -> tuple:
+        # four masks are cheaper to snapshot than to patch back square by square
+        undo_record = (self.white_men, self.white_kings, self.black_men, self.black_kings,
+                       self.color, self.position_forced_by_attack, self.hash, self.get_terms())
+        super().make_hop(position, direction, distance)
+        return undo_record
+
+    def unmake_hop(self, undo_record: tuple):
+        (self.white_men, self.white_kings, self.black_men, self.black_kings,
+         self.color, self.position_forced_by_attack, self.hash, terms) = undo_record
+        self.set_terms(terms)
+
+    def make_move(self, move: tuple, validate: bool = True) -> tuple:
+        if validate and move not in self.legal_moves():
+            raise Exception("Invalid move")
+        
+        undo_record = (self.white_men, self.white_kings, self.black_men, self.black_kings,
+                       self.color, self.position_forced_by_attack, self.hash, self.get_terms())
+        start, landings, captures = move
+        end = landings[-1]
+        moved_piece = piece = self.piece_at(start)
+        board_hash = self.hash ^ Z_BOARD[start][PIECE_INDEX[piece]]
+        self.update_terms(start, piece, 0)
+        self._remove(start)
+        for position in captures:
+            captured_piece = self.piece_at(position)
+            board_hash ^= Z_BOARD[position][PIECE_INDEX[captured_piece]]
+            self.update_terms(position, captured_piece, 0)
+            self._remove(position)
+        if moved_piece == 1 and any(landing <= 3 for landing in landings):
+            piece = K_VALUE
+        elif moved_piece == -1 and any(landing >= 28 for landing in landings):
+            piece = -K_VALUE
+        self.update_terms(end, 0, piece)
+        self._place(end, piece)
+        
+        self.hash = (board_hash ^ Z_BOARD[end][PIECE_INDEX[piece]] ^ Z_BLACK_TURN
+                     ^ Z_FORCED_POS[self.position_forced_by_attack] ^ Z_FORCED_POS[-1])
+        self.position_forced_by_attack = -1
+        self.color = Color.WHITE if self.color == Color.BLACK else Color.BLACK
+        return undo_record
+
+    def unmake_move(self, undo_record: tuple):
+        (self.white_men, self.white_kings, self.black_men, self.black_kings,
+         self.color, self.position_forced_by_attack, self.hash, terms) = undo_record
+        self.set_terms(terms)
+
+    def piece_at(self, position: int) -> int:
+        bit = 1 << position
+        if self.white_men & bit:
+            return 1
+        if self.white_kings & bit:
+            return K_VALUE
+        if self.black_men & bit:
+            return -1
+        if self.black_kings & bit:
+            return -K_VALUE
+        return 0
+
+    def _sides(self) -> tuple[int, int, int, tuple]:
+        if self.color == Color.WHITE:
+            return self.white_men, self.white_kings, self.black_men | self.black_kings, (Direction.UP_L, Direction.UP_R)
+        return self.black_men, self.black_kings, self.white_men | self.white_kings, (Direction.DOWN_L, Direction.DOWN_R)
+
+    def _king_attack(self, position: int, direction: Direction, enemy: int, occupied: int) -> int:
+        blockers = RAY_MASKS[direction][position] & occupied
+        if not blockers:
+            return 0
+        target = nearest_on_ray(blockers, direction)
+        if not enemy & 1 << target or not shift_step(1 << target, direction) & ~occupied & FULL:
+            return 0
+        return RAY_DISTANCE[direction][position][target]
+
+    def possible_attack_in_direction(self, position: int, direction: Direction) -> list:
+        men, kings, enemy, _ = self._sides()
+        occupied = men | kings | enemy
+        bit = 1 << position
+        if kings & bit:
+            distance = self._king_attack(position, direction, enemy, occupied)
+            return [[position, direction, distance]] if distance else []
+        victim = shift_step(bit, direction)
+        if victim & enemy and shift_step(victim, direction) & ~occupied & FULL:
+            return [[position, direction, 1]]
+        return []
+
+    def possible_moves_in_direction(self, direction: Direction) -> tuple[list, list]:
+        men, kings, enemy, forward = self._sides()
+        if direction not in forward:
+            men = 0
+        occupied = self.white_men | self.white_kings | self.black_men | self.black_kings
+        empty = ~occupied & FULL
+
+        movers = step_sources(empty, direction) & (men | kings)
+        jumpers = step_sources(step_sources(empty, direction) & enemy, direction) & men
+        king_attacks = {}
+        for position in iterate_bits(kings):
+            distance = self._king_attack(position, direction, enemy, occupied)
+            if distance:
+                king_attacks[position] = distance
+                jumpers |= 1 << position
+
+        normal_moves = []
+        for position in iterate_bits(movers):
+            if men & 1 << position:
+                normal_moves.append([position, direction, 1])
+                continue
+            blockers = RAY_MASKS[direction][position] & occupied
+            if blockers:
+                reach = RAY_DISTANCE[direction][position][nearest_on_ray(blockers, direction)] - 1
+            else:
+                reach = len(RAY_DISTANCE[direction][position])
+            for distance in range(1, reach + 1):
+                normal_moves.append([position, direction, distance])
+
+        attacking_moves = [[position, direction, king_attacks.get(position, 1)] for position in iterate_bits(jumpers)]
+        return normal_moves, attacking_moves
+
+    def possible_moves(self) -> tuple[list, list]:
+        normal_moves, attacking_moves = [], []
+        for direction in MOVE_ORDER:
+            normal, attacking = self.possible_moves_in_direction(direction)
+            normal_moves += normal
+            attacking_moves += attacking
+        return normal_moves, attacking_moves
+
+    def move_piece(self, position: int, direction: Direction, distance: int):
+        after_move_position = RAYS[direction][position][distance-1]
+        moved_piece = piece = self.piece_at(position)
+        # same promotion rule as Checkers.move_piece: a piece reaching the far row is crowned
+        if self.color == Color.WHITE and after_move_position <= 3:
+            piece = K_VALUE
+        elif self.color == Color.BLACK and after_move_position >= 28:
+            piece = -K_VALUE
+        self.hash ^= Z_BOARD[position][PIECE_INDEX[moved_piece]] ^ Z_BOARD[after_move_position][PIECE_INDEX[piece]]
+        self.update_terms(position, moved_piece, 0)
+        self._remove(position)
+        self.update_terms(after_move_position, 0, piece)
+        self._place(after_move_position, piece)
+
+    def attack_with_piece(self, position: int, direction: Direction, distance: int):
+        captured_position = RAYS[direction][position][distance-1]
+        captured_piece = self.piece_at(captured_position)
+        self.hash ^= Z_BOARD[captured_position][PIECE_INDEX[captured_piece]]
+        self.update_terms(captured_position, captured_piece, 0)
+        self._remove(captured_position)
+        self.move_piece(position, direction, distance+1)
+
+    def _remove(self, position: int):
+        keep = ~(1 << position)
+        self.white_men &= keep
+        self.white_kings &= keep
+        self.black_men &= keep
+        self.black_kings &= keep
+
+    def _place(self, position: int, piece: int):
+        bit = 1 << position
+        if piece == 1:
+            self.white_men |= bit
+        elif piece == K_VALUE:
+            self.white_kings |= bit
+        elif piece == -1:
+            self.black_men |= bit
+        elif piece == -K_VALUE:
+            self.black_kings |= bit
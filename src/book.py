@@ -0,0 +1,151 @@
+import argparse
+import os
+import random
+import struct
+import time
+import numpy as np
+from bitboard import BitboardCheckers
+from classes import Algorithm, Color, Heuristics, pack_move, find_packed_move
+from evaluation import heuristic_by_name
+
+DEFAULT_PLIES = 5
+DEFAULT_DEPTH = 8
+BOOK_FILE = "opening.book"
+BOOK_MOVES = 3  # moves kept per position, the best ones within the build margin of the best score
+
+# file layout: header, sorted position hashes (uint64), packed moves (uint64 x BOOK_MOVES, 0 = none),
+# score of the position from white's point of view (float32)
+MAGIC = b"CKOB"
+HEADER = struct.Struct("<4sHHHQ64s")  # magic, version, plies, depth, entries, heuristic key
+VERSION = 2
+
+
+def opening_positions(plies: int) -> list[BitboardCheckers]:
+    # every position reachable from the starting one in less than `plies` plies, whatever the players chose
+    level = {BitboardCheckers().hash: BitboardCheckers()}
+    reached = dict(level)
+    for _ in range(plies - 1):
+        following = {}
+        for game in level.values():
+            for move in game.legal_moves():
+                child = game.copy()
+                child.make_move(move, validate=False)
+                if child.is_won() is None and child.hash not in reached:
+                    following[child.hash] = child
+        reached.update(following)
+        level = following
+    return list(reached.values())
+
+
+def root_scores(algo: Algorithm, game: BitboardCheckers, depth: int) -> list[tuple[float, tuple]]:
+    # exact score of every root move (no shared bound), so near-equal alternatives can be kept as well
+    algo.start_search()
+    if algo.prepare is not None:
+        algo.prepare(game)
+    scores = []
+    for move in game.legal_moves():
+        undo_record = game.make_move(move, validate=False)
+        score, _ = algo.minmax(game, depth - 1, ply=1)
+        game.unmake_move(undo_record)
+        scores.append((score, move))
+    return scores
+
+
+def build(heuristic_name: str = "sum_and_doubling", weight: float = 0.3, plies: int = DEFAULT_PLIES,
+          depth: int = DEFAULT_DEPTH, margin: float = 0.0, verbose: bool = True) -> tuple[str, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Searches every opening position up to `plies` plies deep with a `depth` ply search.
+
+    A position keeps the moves scoring within `margin` of its best move (at most BOOK_MOVES),
+    best first, so the book can vary its play without giving anything away. Returns the
+    heuristic's key (`Heuristics.key`) with the entries, the book only serves that heuristic.
+    """
+    start = time.perf_counter()
+    heuristic = heuristic_by_name(heuristic_name, weight)
+    algo = Algorithm(heuristic)
+    games = opening_positions(plies)
+    keys = np.zeros(len(games), dtype=np.uint64)
+    moves = np.zeros((len(games), BOOK_MOVES), dtype=np.uint64)
+    scores = np.zeros(len(games), dtype=np.float32)
+    for i, game in enumerate(games):
+        version = -1 if game.color == Color.BLACK else 1
+        ranked = sorted(root_scores(algo, game, depth), key=lambda entry: -entry[0] * version)
+        best = ranked[0][0]
+        chosen = [move for score, move in ranked if (best - score) * version <= margin][:BOOK_MOVES]
+        keys[i] = game.hash
+        moves[i, :len(chosen)] = [pack_move(move) for move in chosen]
+        scores[i] = best
+        if verbose and (i + 1) % 100 == 0:
+            print(f"{i + 1}/{len(games)} positions, {time.perf_counter() - start:.1f}s")
+    order = np.argsort(keys)
+    if verbose:
+        print(f"{len(games)} positions searched in {time.perf_counter() - start:.1f}s")
+    return Heuristics.key(heuristic), keys[order], moves[order], scores[order]
+
+
+def save(path: str, plies: int, depth: int, heuristic_key: str, keys: np.ndarray, moves: np.ndarray, scores: np.ndarray):
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, plies, depth, len(keys), heuristic_key.encode()))
+        file.write(keys.tobytes())
+        file.write(moves.tobytes())
+        file.write(scores.tobytes())
+
+
+class OpeningBook:
+    """
+    Read-only opening book, memory-mapped from a file written by `save`.
+
+    `heuristic_key` names the heuristic whose searches chose the moves and scores;
+    `Algorithm` ignores a book made for another heuristic.
+    """
+    def __init__(self, path: str = BOOK_FILE):
+        with open(path, "rb") as file:
+            magic, version, self.plies, self.depth, entries, heuristic_key = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening book file")
+        self.heuristic_key = heuristic_key.rstrip(b"\0").decode()
+        offset = HEADER.size
+        self.keys = np.memmap(path, dtype=np.uint64, mode="r", offset=offset, shape=(entries,))
+        offset += 8 * entries
+        self.moves = np.memmap(path, dtype=np.uint64, mode="r", offset=offset, shape=(entries, BOOK_MOVES))
+        offset += 8 * BOOK_MOVES * entries
+        self.scores = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(entries,))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, game) -> tuple[float, tuple] | None:
+        # a book move for the position (picked at random among the stored ones) with its score, or None
+        key = np.uint64(game.hash)
+        position = int(np.searchsorted(self.keys, key))
+        if position == len(self.keys) or self.keys[position] != key:
+            return None
+        packed = [int(move) for move in self.moves[position] if move]
+        move = find_packed_move(game, random.choice(packed)) if packed else None
+        if move is None:
+            return None
+        return float(self.scores[position]), move
+
+
+def load_book(path: str = BOOK_FILE, heuristic=None) -> OpeningBook | None:
+    # None when there is no book, or when it was built for another heuristic than `heuristic`
+    if not os.path.exists(path):
+        return None
+    book = OpeningBook(path)
+    if heuristic is not None and book.heuristic_key != Heuristics.key(heuristic):
+        return None
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the opening book from deep searches of the first plies")
+    parser.add_argument("--heuristic", default="sum_and_doubling")
+    parser.add_argument("--weight", type=float, default=0.3)
+    parser.add_argument("--plies", type=int, default=DEFAULT_PLIES, help="positions reachable in fewer plies are searched")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="search depth for every position")
+    parser.add_argument("--margin", type=float, default=0.0, help="keep moves this close to the best one")
+    parser.add_argument("--output", default=BOOK_FILE)
+    args = parser.parse_args()
+    heuristic_key, keys, moves, scores = build(args.heuristic, args.weight, args.plies, args.depth, args.margin)
+    save(args.output, args.plies, args.depth, heuristic_key, keys, moves, scores)
+    print(f"saved {args.output} ({os.path.getsize(args.output):,} bytes)")
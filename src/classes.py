@@ -1,9 +1,35 @@
 from enum import Enum
 from collections.abc import Callable
 import math
+import os
 import random
+import threading
+import time
+import numpy as np
+from transposition import TranspositionTable, DEFAULT_SIZE_MB, EXACT, LOWER, UPPER
+from stats import SearchStats
 
 K_VALUE = 5
+TB_WIN = 10000  # a won position scores TB_WIN minus the plies to the end, far above any heuristic score
+TB_WIN_MIN = TB_WIN - 1000  # anything further from zero is a tablebase win or loss
+
+
+def score_to_memory(score: float, ply: int) -> float:
+    # tablebase wins count plies from the root; the table keeps them counted from the stored node
+    if score > TB_WIN_MIN:
+        return score + ply
+    if score < -TB_WIN_MIN:
+        return score - ply
+    return score
+
+
+def score_from_memory(score: float, ply: int) -> float:
+    if score > TB_WIN_MIN:
+        return score - ply
+    if score < -TB_WIN_MIN:
+        return score + ply
+    return score
+
 
 class Direction(Enum): #dla parzystego wiersza liczac od 0
     UP_L = -4
@@ -19,6 +45,83 @@ class Difficulty(Enum):
     EASY = 1
     MEDIUM = 3
     HARD = 7
+
+OFF_BOARD = -1
+
+def _neighbour(position: int, direction: Direction) -> int:
+    if position%8 == 4 and direction in [Direction.DOWN_L, Direction.UP_L]:
+        return OFF_BOARD
+    if position%8 == 3 and direction in [Direction.UP_R, Direction.DOWN_R]:
+        return OFF_BOARD
+    if position <= 3 and direction in [Direction.UP_L, Direction.UP_R]:
+        return OFF_BOARD
+    if position >= 28 and direction in [Direction.DOWN_L, Direction.DOWN_R]:
+        return OFF_BOARD
+    is_row_odd = position//4 % 2
+    return position + direction.value - is_row_odd
+
+def _ray(position: int, direction: Direction) -> tuple[int, ...]:
+    ray = []
+    position = _neighbour(position, direction)
+    while position != OFF_BOARD:
+        ray.append(position)
+        position = _neighbour(position, direction)
+    return tuple(ray)
+
+# NEIGHBOURS[direction][position] is the next square on the diagonal or OFF_BOARD,
+# RAYS[direction][position] lists every square up to the edge of the board (flying kings)
+NEIGHBOURS = {direction: [_neighbour(position, direction) for position in range(32)] for direction in Direction}
+RAYS = {direction: [_ray(position, direction) for position in range(32)] for direction in Direction}
+
+# pairs of diagonal neighbours rewarded by the doubling heuristics, square 27 is not paired on DOWN_R
+DOUBLING_PAIRS = {
+    Direction.DOWN_L: [(pos, NEIGHBOURS[Direction.DOWN_L][pos]) for pos in range(28)
+                       if NEIGHBOURS[Direction.DOWN_L][pos] != OFF_BOARD],
+    Direction.DOWN_R: [(pos, NEIGHBOURS[Direction.DOWN_R][pos]) for pos in range(27)
+                       if NEIGHBOURS[Direction.DOWN_R][pos] != OFF_BOARD],
+}
+ADVANCEMENT_REPEATS = len(DOUBLING_PAIRS[Direction.DOWN_R])
+# rows a piece has come towards promotion, as doubling_aggresive counts them (square 31 never counts)
+ADVANCE_WHITE = [(31-pos)//4 for pos in range(31)] + [0]
+ADVANCE_BLACK = [pos//4 for pos in range(31)] + [0]
+# every square a square forms a doubling pair with
+PAIR_PARTNERS = [tuple([neighbour for direction in DOUBLING_PAIRS for pos, neighbour in DOUBLING_PAIRS[direction] if pos == square]
+                       + [pos for direction in DOUBLING_PAIRS for pos, neighbour in DOUBLING_PAIRS[direction] if neighbour == square])
+                 for square in range(32)]
+# index arrays for the batched heuristics: both squares of every doubling pair, rows to promotion
+PAIR_FIRST = np.array([pos for direction in DOUBLING_PAIRS for pos, _ in DOUBLING_PAIRS[direction]])
+PAIR_SECOND = np.array([neighbour for direction in DOUBLING_PAIRS for _, neighbour in DOUBLING_PAIRS[direction]])
+ADVANCE_TABLES = np.array([ADVANCE_WHITE, ADVANCE_BLACK])
+
+# random bitstrings for zobrist hashing, seeded so that every position (and every process) shares them
+ZOBRIST_SEED = 1337
+_zobrist_random = random.Random(ZOBRIST_SEED)
+Z_BOARD = [[_zobrist_random.getrandbits(64) for _ in range(4)] for _ in range(32)]
+Z_BLACK_TURN = _zobrist_random.getrandbits(64)
+# 33 positions for forced attack: 0-31 for board indices, 32 (index -1) for value -1 (no forced move)
+Z_FORCED_POS = [_zobrist_random.getrandbits(64) for _ in range(33)]
+PIECE_INDEX = {Color.WHITE.value[0]: 0, Color.WHITE.value[1]: 1, Color.BLACK.value[0]: 2, Color.BLACK.value[1]: 3}
+
+DIRECTIONS = list(Direction)
+
+MAX_PACKED_LANDINGS = 11
+
+def pack_move(move: tuple | None) -> int:
+    # start and every landing square (5 bits each), landing count (4 bits); 0 stands for no move
+    # or a chain too long to fit in 64 bits
+    if move is None or len(move[1]) > MAX_PACKED_LANDINGS:
+        return 0
+    start, landings, _ = move
+    packed = start
+    for landing in landings:
+        packed = packed << 5 | landing
+    return packed << 4 | len(landings)
+
+def find_packed_move(game: 'Checkers', packed: int) -> tuple | None:
+    for move in game.legal_moves():
+        if pack_move(move) == packed:
+            return move
+    return None
     
 class Checkers:
     def __init__(self, board: list[int] | None = None, color = Color.WHITE, position_forced_by_attack = -1):
@@ -28,37 +131,115 @@ class Checkers:
             self.board = board
         self.color = color
         self.position_forced_by_attack = position_forced_by_attack
+        self.hash = self.compute_hash()
+        # piece-square tables (indexed [piece + K_VALUE][position]) whose sums the position keeps, see track_table
+        self.square_tables = []
+        self.set_terms(self.compute_terms())
+
+    def compute_terms(self) -> tuple:
+        # evaluation terms the heuristics read: material, white pieces, black pieces, backline,
+        # doubling pairs (white minus black), advancement and the sums of the tracked piece-square
+        # tables; kept up to date by update_terms
+        board = self.board
+        white = [position for position in range(32) if board[position] > 0]
+        black = [position for position in range(32) if board[position] < 0]
+        backline = sum(1 for position in white if position >= 28) - sum(1 for position in black if position <= 3)
+        advancement = sum(ADVANCE_WHITE[position] for position in white) - sum(ADVANCE_BLACK[position] for position in black)
+        square_sums = tuple(sum(table[board[position] + K_VALUE][position] for position in range(32))
+                            for table in self.square_tables)
+        return sum(board), len(white), len(black), backline, Heuristics.doubling_pairs(board), advancement, square_sums
+
+    def get_terms(self) -> tuple:
+        return (self.material, self.white_pieces, self.black_pieces, self.backline, self.pairs, self.advancement,
+                tuple(self.square_sums))
+
+    def set_terms(self, terms: tuple):
+        self.material, self.white_pieces, self.black_pieces, self.backline, self.pairs, self.advancement, square_sums = terms
+        self.square_sums = list(square_sums)
+
+    def track_table(self, table: list[list[int]]) -> int:
+        # starts keeping the sum of a piece-square table, returns its index in square_sums;
+        # tables have to be tracked at the root of a search, before any move is made
+        for index, tracked in enumerate(self.square_tables):
+            if tracked is table:
+                return index
+        self.square_tables.append(table)
+        board = self.board
+        self.square_sums.append(sum(table[board[position] + K_VALUE][position] for position in range(32)))
+        return len(self.square_tables) - 1
+
+    def update_terms(self, position: int, old: int, new: int):
+        # square `position` changes from `old` to `new`, called before the board itself changes
+        self.material += new - old
+        for piece, sign in ((old, -1), (new, 1)):
+            if piece > 0:
+                self.white_pieces += sign
+                self.advancement += sign * ADVANCE_WHITE[position]
+                if position >= 28:
+                    self.backline += sign
+            elif piece < 0:
+                self.black_pieces += sign
+                self.advancement -= sign * ADVANCE_BLACK[position]
+                if position <= 3:
+                    self.backline -= sign
+        white_change = (new > 0) - (old > 0)
+        black_change = (new < 0) - (old < 0)
+        for partner in PAIR_PARTNERS[position]:
+            other = self.piece_at(partner)
+            if other > 0:
+                self.pairs += white_change
+            elif other < 0:
+                self.pairs -= black_change
+        for index, table in enumerate(self.square_tables):
+            self.square_sums[index] += table[new + K_VALUE][position] - table[old + K_VALUE][position]
+
+    def compute_hash(self) -> int:
+        h = 0
+        board = self.board
+        for position in range(32):
+            piece = board[position]
+            if piece != 0:
+                h ^= Z_BOARD[position][PIECE_INDEX[piece]]
+        
+        if self.color == Color.BLACK:
+            h ^= Z_BLACK_TURN
+        
+        h ^= Z_FORCED_POS[self.position_forced_by_attack]
+        return h
+
+    def copy(self) -> 'Checkers':
+        game = Checkers(self.board[:], self.color, self.position_forced_by_attack)
+        game.square_tables = self.square_tables[:]
+        game.square_sums = self.square_sums[:]
+        return game
+    
+    def is_won(self) -> Color | None:
+        # the side that has taken every enemy piece
+        if self.black_pieces == 0:
+            return Color.WHITE
+        if self.white_pieces == 0:
+            return Color.BLACK
+        return None
     
     def position_after_movement(self, position: int, direction: Direction, distance = 1) -> int:
-        for _ in range(distance):
-            if position%8 == 4 and direction in [Direction.DOWN_L, Direction.UP_L]:
-                raise Exception("Out of bounds check")
-            if position%8 == 3 and direction in [Direction.UP_R, Direction.DOWN_R]:
-                raise Exception("Out of bounds check")
-            if position <= 3 and direction in [Direction.UP_L, Direction.UP_R]:
-                raise Exception("Out of bounds check")
-            if position >= 28 and direction in [Direction.DOWN_L, Direction.DOWN_R]:
-                raise Exception("Out of bounds check")
-            
-            is_row_odd = position//4 % 2
-            position += direction.value - is_row_odd
-            
-        return position
+        ray = RAYS[direction][position]
+        if 0 < distance <= len(ray):
+            return ray[distance-1]
+        return OFF_BOARD
     
     def possible_attack_in_direction(self, position: int, direction: Direction) -> list:
-        distance = 1
-        try:
-            after_move_index = self.position_after_movement(position, direction)
-            if abs(self.board[position]) == K_VALUE:
-                while self.board[after_move_index] == 0:
-                    after_move_index = self.position_after_movement(after_move_index, direction)
-                    distance += 1
-                
-            after_landing_index = self.position_after_movement(after_move_index, direction)
-        except:
+        ray = RAYS[direction][position]
+        target_index = 0
+        if abs(self.board[position]) == K_VALUE:
+            while target_index < len(ray) and self.board[ray[target_index]] == 0:
+                target_index += 1
+        if target_index + 1 >= len(ray):
             return []
+        
+        after_move_index = ray[target_index]
+        after_landing_index = ray[target_index + 1]
         if self.board[after_move_index] not in self.color.value+[0] and self.board[after_landing_index] == 0:
-            return [[position, direction, distance]]
+            return [[position, direction, target_index + 1]]
             
         return []
     
@@ -69,25 +250,17 @@ class Checkers:
         for position in range(0, 32):
             if self.board[position] not in self.color.value:
                 continue
-            try:
-                after_move_index = self.position_after_movement(position, direction)
-            except:
-                continue
             if self.board[position] == 1 and direction in [Direction.DOWN_L, Direction.DOWN_R]:
                 continue
             if self.board[position] == -1 and direction in [Direction.UP_L, Direction.UP_R]:
                 continue
             
-            distance = 1
-            while self.board[after_move_index] == 0:
+            for distance, after_move_index in enumerate(RAYS[direction][position], 1):
+                if self.board[after_move_index] != 0:
+                    break
                 normal_moves.append([position, direction, distance])
                 if abs(self.board[position]) != K_VALUE:
                     break
-                try:
-                    after_move_index = self.position_after_movement(after_move_index, direction)
-                    distance += 1
-                except:
-                    break
 
             attacking_moves += self.possible_attack_in_direction(position, direction)
                 
@@ -103,21 +276,28 @@ class Checkers:
         return normal_moves, attacking_moves
     
     def move_piece(self, position: int, direction: Direction, distance: int):
-        for _ in range(distance):
-            after_move_position = self.position_after_movement(position, direction)
-            
-            if position <= 7 and self.color == Color.WHITE:
-                self.board[after_move_position] = K_VALUE
-            elif position > 23 and self.color == Color.BLACK:
-                self.board[after_move_position] = -K_VALUE
-            else:
-                self.board[after_move_position] = self.board[position]
-            self.board[position] = 0
-            
-            position = after_move_position
+        after_move_position = RAYS[direction][position][distance-1]
+        piece = self.board[position]
+        
+        if after_move_position <= 3 and self.color == Color.WHITE:
+            landed_piece = K_VALUE
+        elif after_move_position >= 28 and self.color == Color.BLACK:
+            landed_piece = -K_VALUE
+        else:
+            landed_piece = piece
+        self.update_terms(position, piece, 0)
+        self.board[position] = 0
+        self.update_terms(after_move_position, 0, landed_piece)
+        self.board[after_move_position] = landed_piece
+        self.hash ^= Z_BOARD[position][PIECE_INDEX[piece]] ^ Z_BOARD[after_move_position][PIECE_INDEX[landed_piece]]
     
     
     def attack_with_piece(self, position: int, direction: Direction, distance: int):
+        captured_position = RAYS[direction][position][distance-1]
+        captured_piece = self.board[captured_position]
+        self.hash ^= Z_BOARD[captured_position][PIECE_INDEX[captured_piece]]
+        self.update_terms(captured_position, captured_piece, 0)
+        self.board[captured_position] = 0
         self.move_piece(position, direction, distance+1)
 
     
@@ -145,28 +325,38 @@ class Checkers:
             print(row_str + " |")
         print("   -----------------")
         
-    def turn(self, position: int, direction: Direction, distance: int) -> bool:
-        if self.position_forced_by_attack >= 0 and self.position_forced_by_attack != position:
-                raise Exception("You must move the piece that is currently attacking.")
+    def piece_at(self, position: int) -> int:
+        return self.board[position]
 
-        normal_moves, attacking_moves = self.possible_moves()
-        
+    def make_hop(self, position: int, direction: Direction, distance: int) -> tuple:
+        # plays a single move or jump without validation; after a jump the turn goes on while
+        # the piece can keep attacking. The returned record restores the position in unmake_hop
+        color = self.color
+        position_forced_by_attack = self.position_forced_by_attack
+        board_hash = self.hash
+        terms = self.get_terms()
+        piece = self.piece_at(position)
+        captured_position = RAYS[direction][position][distance-1]
+        captured_piece = self.piece_at(captured_position)
         turn_finished = True
         
-        if attacking_moves == [] and [position, direction, distance] in normal_moves:
+        if captured_piece == 0:
+            landing_position = captured_position
+            captured_position = OFF_BOARD
             self.move_piece(position, direction, distance)
             turn_finished = True 
 
-        elif [position, direction, distance] in attacking_moves or [position, direction, distance] == attacking_moves:
+        else:
+            landing_position = RAYS[direction][position][distance]
             self.attack_with_piece(position, direction, distance)
 
-            after_attack_pos = self.position_after_movement(position, direction, distance+1)
+            after_attack_pos = landing_position
             can_attack_again = []
-            if self.board[after_attack_pos] != Color.WHITE.value[0]:
+            if self.piece_at(after_attack_pos) != Color.WHITE.value[0]:
                 can_attack_again = (self.possible_attack_in_direction(after_attack_pos, Direction.DOWN_L) + 
                                     self.possible_attack_in_direction(after_attack_pos, Direction.DOWN_R)) != []
             
-            if self.board[after_attack_pos] != Color.BLACK.value[0]:
+            if self.piece_at(after_attack_pos) != Color.BLACK.value[0]:
                 can_attack_again = (self.possible_attack_in_direction(after_attack_pos, Direction.UP_L) + 
                                     self.possible_attack_in_direction(after_attack_pos, Direction.UP_R)) != []
             
@@ -177,17 +367,123 @@ class Checkers:
                 self.position_forced_by_attack = -1
                 turn_finished = True
 
-        else:
-            raise Exception("Invalid move")
-
+        if self.position_forced_by_attack != position_forced_by_attack:
+            self.hash ^= Z_FORCED_POS[position_forced_by_attack] ^ Z_FORCED_POS[self.position_forced_by_attack]
 
         if turn_finished:
             if self.color == Color.BLACK:
                 self.color = Color.WHITE
             else:
                 self.color = Color.BLACK    
+            self.hash ^= Z_BLACK_TURN
+        
+        return (position, piece, landing_position, captured_position, captured_piece, color, position_forced_by_attack, board_hash, terms)
+
+    def unmake_hop(self, undo_record: tuple):
+        position, piece, landing_position, captured_position, captured_piece, color, position_forced_by_attack, board_hash, terms = undo_record
+        self.board[landing_position] = 0
+        self.board[position] = piece
+        if captured_position != OFF_BOARD:
+            self.board[captured_position] = captured_piece
+        self.color = color
+        self.position_forced_by_attack = position_forced_by_attack
+        self.hash = board_hash
+        self.set_terms(terms)
+
+    def turn(self, position: int, direction: Direction, distance: int) -> bool:
+        if self.position_forced_by_attack >= 0 and self.position_forced_by_attack != position:
+                raise Exception("You must move the piece that is currently attacking.")
+
+        normal_moves, attacking_moves = self.possible_moves()
+        
+        if not (attacking_moves == [] and [position, direction, distance] in normal_moves
+                or [position, direction, distance] in attacking_moves):
+            raise Exception("Invalid move")
+        
+        self.make_hop(position, direction, distance)
+        return self.position_forced_by_attack == -1
+
+    def legal_moves(self) -> list[tuple]:
+        # whole turns: (start, landing squares, captured squares), a multi-jump is a single move
+        normal_moves, attacking_moves = self.possible_moves()
+        if self.position_forced_by_attack >= 0:
+            attacking_moves = [move for move in attacking_moves if move[0] == self.position_forced_by_attack]
+        
+        if not attacking_moves:
+            return [(position, (RAYS[direction][position][distance-1],), ()) for position, direction, distance in normal_moves]
+        
+        moves = []
+        for position, direction, distance in attacking_moves:
+            self._extend_capture_chain(position, [], [], position, direction, distance, moves)
+        return moves
+
+    def _extend_capture_chain(self, start: int, landings: list, captures: list, position: int, direction: Direction, distance: int, moves: list):
+        landings.append(RAYS[direction][position][distance])
+        captures.append(RAYS[direction][position][distance-1])
+        undo_record = self.make_hop(position, direction, distance)
+        
+        landing_position = self.position_forced_by_attack
+        if landing_position == -1:
+            moves.append((start, tuple(landings), tuple(captures)))
+        else:
+            # the same directions possible_moves allows the piece: all for kings, forward for men
+            piece = self.piece_at(landing_position)
+            if abs(piece) == K_VALUE:
+                directions = DIRECTIONS
+            elif piece > 0:
+                directions = [Direction.UP_L, Direction.UP_R]
+            else:
+                directions = [Direction.DOWN_L, Direction.DOWN_R]
+            for next_direction in directions:
+                for _, _, next_distance in self.possible_attack_in_direction(landing_position, next_direction):
+                    self._extend_capture_chain(start, landings, captures, landing_position, next_direction, next_distance, moves)
         
-        return turn_finished
+        self.unmake_hop(undo_record)
+        landings.pop()
+        captures.pop()
+
+    def make_move(self, move: tuple, validate: bool = True) -> tuple:
+        # plays a whole turn in place, the returned record restores it in unmake_move;
+        # moves that come straight from legal_moves() can skip the validation
+        if validate and move not in self.legal_moves():
+            raise Exception("Invalid move")
+        
+        start, landings, captures = move
+        end = landings[-1]
+        piece = self.board[start]
+        captured_pieces = tuple(self.board[position] for position in captures)
+        undo_record = (start, piece, end, captures, captured_pieces, self.color, self.position_forced_by_attack, self.hash, self.get_terms())
+        
+        self.hash ^= Z_BOARD[start][PIECE_INDEX[piece]]
+        self.update_terms(start, piece, 0)
+        self.board[start] = 0
+        for position, captured_piece in zip(captures, captured_pieces):
+            self.hash ^= Z_BOARD[position][PIECE_INDEX[captured_piece]]
+            self.update_terms(position, captured_piece, 0)
+            self.board[position] = 0
+        if piece == 1 and any(landing <= 3 for landing in landings):
+            piece = K_VALUE
+        elif piece == -1 and any(landing >= 28 for landing in landings):
+            piece = -K_VALUE
+        self.update_terms(end, 0, piece)
+        self.board[end] = piece
+        self.hash ^= Z_BOARD[end][PIECE_INDEX[piece]]
+        
+        self.hash ^= Z_FORCED_POS[self.position_forced_by_attack] ^ Z_FORCED_POS[-1] ^ Z_BLACK_TURN
+        self.position_forced_by_attack = -1
+        self.color = Color.WHITE if self.color == Color.BLACK else Color.BLACK
+        return undo_record
+
+    def unmake_move(self, undo_record: tuple):
+        start, piece, end, captures, captured_pieces, color, position_forced_by_attack, board_hash, terms = undo_record
+        self.board[end] = 0
+        self.board[start] = piece
+        for position, captured_piece in zip(captures, captured_pieces):
+            self.board[position] = captured_piece
+        self.color = color
+        self.position_forced_by_attack = position_forced_by_attack
+        self.hash = board_hash
+        self.set_terms(terms)
 
 class Player:
     @staticmethod
@@ -263,10 +559,17 @@ class Heuristics:
     def __init__(self, weight: float = 0.3) -> None:
         self.weight = weight
         
+    @staticmethod
+    def by_name(name: str, weight: float = 0.3) -> Callable[[list[int]], float]:
+        # the name and weight pickle cleanly, so worker processes rebuild the heuristic from them
+        return getattr(Heuristics(weight), name)
+        
     @staticmethod
     def random_score(board: list[int]) -> float:
         return random.random()
     
+    # The weighted terms are counted as integers and scaled once at the end, so the
+    # scalar and the batched (*_batch) versions round identically and agree exactly.
     @staticmethod
     def sum_score(board: list[int]) -> float:
         if not any(piece in board for piece in Color.BLACK.value):
@@ -282,17 +585,27 @@ class Heuristics:
         if not any(piece in board for piece in Color.WHITE.value):
             return -math.inf
         
-        score = sum(board)
+        backline = 0
         for i in range(4):
             if board[i] in Color.BLACK.value:
-                score -= self.weight
+                backline -= 1
                 
         for i in range(28, 32):
             if board[i] in Color.WHITE.value:
-                score += self.weight
+                backline += 1
         
-        return score
+        return sum(board) + self.weight * backline
     
+    @staticmethod
+    def doubling_pairs(board: list[int]) -> int:
+        pairs = 0
+        for direction in (Direction.DOWN_L, Direction.DOWN_R):
+            for pos, neighbour in DOUBLING_PAIRS[direction]:
+                if board[pos] in Color.BLACK.value and board[neighbour] in Color.BLACK.value:
+                    pairs -= 1
+                elif board[pos] in Color.WHITE.value and board[neighbour] in Color.WHITE.value:
+                    pairs += 1
+        return pairs
 
     def sum_and_doubling(self, board: list[int]) -> float:
         if not any(piece in board for piece in Color.BLACK.value):
@@ -300,29 +613,7 @@ class Heuristics:
         if not any(piece in board for piece in Color.WHITE.value):
             return -math.inf
         
-        score = sum(board)
-        
-        for pos in range(28):
-            is_row_odd = pos//4 % 2
-            if pos % 8 == 4:
-                continue
-            
-            if board[pos] in Color.BLACK.value and board[pos + Direction.DOWN_L.value - is_row_odd] in Color.BLACK.value:
-                score -= self.weight
-            elif board[pos] in Color.WHITE.value and board[pos + Direction.DOWN_L.value - is_row_odd] in Color.WHITE.value:
-                score += self.weight
-        
-        for pos in range(27):
-            is_row_odd = pos//4 % 2
-            if pos % 8 == 3:
-                continue
-            
-            if board[pos] in Color.BLACK.value and board[pos + Direction.DOWN_R.value - is_row_odd] in Color.BLACK.value:
-                score -= self.weight
-            elif board[pos] in Color.WHITE.value and board[pos + Direction.DOWN_R.value - is_row_odd] in Color.WHITE.value:
-                score += self.weight
-            
-        return score
+        return sum(board) + self.weight * self.doubling_pairs(board)
         
     def doubling_aggresive(self, board: list[int]) -> float:
         if not any(piece in board for piece in Color.BLACK.value):
@@ -330,94 +621,395 @@ class Heuristics:
         if not any(piece in board for piece in Color.WHITE.value):
             return -math.inf
         
-        score = sum(board)
-        
-        for pos in range(28):
-            is_row_odd = pos//4 % 2
-            if pos % 8 == 4:
+        advancement = 0
+        for pos in range(31):
+            if board[pos] == 0:
                 continue
-            
-            if board[pos] in Color.BLACK.value and board[pos + Direction.DOWN_L.value - is_row_odd] in Color.BLACK.value:
-                score -= self.weight
-            elif board[pos] in Color.WHITE.value and board[pos + Direction.DOWN_L.value - is_row_odd] in Color.WHITE.value:
-                score += self.weight
-        
-        for pos in range(27):
-            is_row_odd = pos//4 % 2
-            if pos % 8 == 3:
-                continue
-            
-            if board[pos] in Color.BLACK.value and board[pos + Direction.DOWN_R.value - is_row_odd] in Color.BLACK.value:
-                score -= self.weight
-            elif board[pos] in Color.WHITE.value and board[pos + Direction.DOWN_R.value - is_row_odd] in Color.WHITE.value:
-                score += self.weight
-            
-            for pos in range(31):
-                if board[pos] == 0:
-                    continue
-                elif board[pos] in Color.BLACK.value:
-                    score -= pos//4 * self.weight
-                else:
-                    score += (31-pos)//4 * self.weight
-            
-        return score
+            elif board[pos] in Color.BLACK.value:
+                advancement -= pos//4
+            else:
+                advancement += (31-pos)//4
+        
+        # the advancement term has always been added once per DOWN_R pair
+        return sum(board) + self.weight * (self.doubling_pairs(board) + ADVANCEMENT_REPEATS * advancement)
+    
+    @staticmethod
+    def batch_terminal(boards: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        scores[~(boards > 0).any(axis=1)] = -math.inf
+        scores[~(boards < 0).any(axis=1)] = math.inf
+        return scores
+    
+    @staticmethod
+    def batch_doubling_pairs(boards: np.ndarray) -> np.ndarray:
+        first, second = boards[:, PAIR_FIRST], boards[:, PAIR_SECOND]
+        return ((first > 0) & (second > 0)).sum(axis=1) - ((first < 0) & (second < 0)).sum(axis=1)
+    
+    @staticmethod
+    def sum_score_batch(boards: np.ndarray) -> np.ndarray:
+        # boards: (N, 32) int8, one row per position
+        scores = boards.sum(axis=1, dtype=np.int64).astype(np.float64)
+        return Heuristics.batch_terminal(boards, scores)
+    
+    def sum_and_backline_batch(self, boards: np.ndarray) -> np.ndarray:
+        backline = (boards[:, 28:32] > 0).sum(axis=1) - (boards[:, :4] < 0).sum(axis=1)
+        scores = boards.sum(axis=1, dtype=np.int64) + self.weight * backline
+        return self.batch_terminal(boards, scores)
+    
+    def sum_and_doubling_batch(self, boards: np.ndarray) -> np.ndarray:
+        scores = boards.sum(axis=1, dtype=np.int64) + self.weight * self.batch_doubling_pairs(boards)
+        return self.batch_terminal(boards, scores)
+    
+    def doubling_aggresive_batch(self, boards: np.ndarray) -> np.ndarray:
+        advancement = (np.where(boards > 0, ADVANCE_TABLES[0], 0) - np.where(boards < 0, ADVANCE_TABLES[1], 0)).sum(axis=1)
+        terms = self.batch_doubling_pairs(boards) + ADVANCEMENT_REPEATS * advancement
+        scores = boards.sum(axis=1, dtype=np.int64) + self.weight * terms
+        return self.batch_terminal(boards, scores)
+    
+    # *_incremental: the same scores read from the terms a position keeps up to date (Checkers.update_terms)
+    @staticmethod
+    def sum_score_incremental(game: Checkers) -> float:
+        if game.black_pieces == 0:
+            return math.inf
+        if game.white_pieces == 0:
+            return -math.inf
+        return game.material
+    
+    def sum_and_backline_incremental(self, game: Checkers) -> float:
+        if game.black_pieces == 0:
+            return math.inf
+        if game.white_pieces == 0:
+            return -math.inf
+        return game.material + self.weight * game.backline
+    
+    def sum_and_doubling_incremental(self, game: Checkers) -> float:
+        if game.black_pieces == 0:
+            return math.inf
+        if game.white_pieces == 0:
+            return -math.inf
+        return game.material + self.weight * game.pairs
+    
+    def doubling_aggresive_incremental(self, game: Checkers) -> float:
+        if game.black_pieces == 0:
+            return math.inf
+        if game.white_pieces == 0:
+            return -math.inf
+        return game.material + self.weight * (game.pairs + ADVANCEMENT_REPEATS * game.advancement)
     
+    @staticmethod
+    def incremental(heuristic: Callable[[list[int]], float]) -> Callable[[Checkers], float] | None:
+        # heuristics defined as data (evaluation.TableHeuristic) carry their own incremental and batch versions
+        if hasattr(heuristic, "incremental"):
+            return heuristic.incremental
+        owner = getattr(heuristic, "__self__", Heuristics)
+        return getattr(owner, heuristic.__name__ + "_incremental", None)
     
+    @staticmethod
+    def batched(heuristic: Callable[[list[int]], float]) -> Callable[[np.ndarray], np.ndarray] | None:
+        # the *_batch counterpart of a heuristic, None for heuristics without one (random_score)
+        if hasattr(heuristic, "batch"):
+            return heuristic.batch
+        owner = getattr(heuristic, "__self__", Heuristics)
+        return getattr(owner, heuristic.__name__ + "_batch", None)
+    
+    @staticmethod
+    def key(heuristic: Callable[[list[int]], float]) -> str:
+        # name and weight; the table and method versions of a heuristic score alike and share it
+        weight = getattr(heuristic, "weight", getattr(getattr(heuristic, "__self__", None), "weight", None))
+        return f"{heuristic.__name__}-{weight}"
+    
+    
+MAX_PLY = 64
+ASPIRATION_WINDOW = 1.0  # one man either side of the previous iteration's score
+QUIESCENCE_DEPTH = 6  # capture plies resolved past the horizon when quiescence is switched on
+# scanning the doubling pairs costs more than evaluating every sibling leaf in one NumPy call,
+# the cheaper heuristics lose more to the leaves pruning would have skipped
+BATCHED_HEURISTICS = {"sum_and_doubling", "doubling_aggresive"}
+
 class Algorithm:
-    def __init__(self, heuristic: Callable[[list[int]], float]):
+    def __init__(self, heuristic: Callable[[list[int]], float], debug_hash: bool = False, memory_mb: float = DEFAULT_SIZE_MB,
+                 ordering: bool = True, pvs: bool = False, quiescence_depth: int = 0, batch: bool | None = None,
+                 incremental: bool = True, tablebase=None, book=None, memory_dir: str | None = None,
+                 stats: bool = False):
         self.heuristic = heuristic
-        self.memory = {}
-        self.init_zobrist()
+        # leaves read the terms the position maintains during make/unmake, when the heuristic has such a version
+        self.incremental_heuristic = Heuristics.incremental(heuristic) if incremental else None
+        # called with the root position of every search, table heuristics start tracking their sums there
+        self.prepare = getattr(heuristic, "prepare", None) if incremental else None
+        # children of depth 1 nodes are scored together by the vectorised heuristic, by default
+        # only for the heuristics in BATCHED_HEURISTICS and only if they are not read incrementally
+        if batch is None:
+            batch = self.incremental_heuristic is None and getattr(heuristic, "__name__", None) in BATCHED_HEURISTICS
+        self.batch_heuristic = Heuristics.batched(heuristic) if batch else None
+        # with memory_dir the table is loaded from (and save_memory merges it into) a file per heuristic,
+        # quiescence depth and tablebase size (tablebase scores are stored too), so scores of
+        # different evaluations never share a table
+        tablebase_pieces = 0 if tablebase is None else tablebase.pieces
+        self.memory_tag = f"{Heuristics.key(heuristic)}-q{quiescence_depth}-tb{tablebase_pieces}"
+        self.memory_file = None if memory_dir is None else os.path.join(memory_dir, self.memory_tag + ".tt")
+        if self.memory_file is None:
+            self.memory = TranspositionTable(memory_mb)
+        else:
+            self.memory = TranspositionTable.load(self.memory_file, self.memory_tag, memory_mb)
+        # debug mode: check the incrementally updated hash against a full recompute at every node
+        self.debug_hash = debug_hash
+        # move ordering: transposition table move, captures of kings, killer moves, history table
+        self.ordering = ordering
+        # principal variation search: null-window probes for all but the first move, aspiration windows in search()
+        self.pvs = pvs
+        # at the horizon keep playing the mandatory captures (at most this many plies) before evaluating
+        self.quiescence_depth = quiescence_depth
+        # endgame tablebase (tablebase.Tablebase): exact scores below the root once few enough pieces are left
+        self.tablebase = tablebase
+        # opening book (book.OpeningBook): positions found in it are answered without searching,
+        # a book built for another heuristic is ignored, its moves and scores are not ours
+        if book is not None and book.heuristic_key != Heuristics.key(heuristic):
+            book = None
+        self.book = book
+        # search statistics (stats.SearchStats), a fresh object per search when switched on, otherwise None
+        self.collect_stats = stats
+        self.stats = None
+        # indexed by start and final square of the move
+        self.history = [0] * 1024
+        self.searching = False
+        self.start_search()
     
-    def init_zobrist(self):
-        # random bitstrings for zobrist hashing
-        self.z_board = [[random.getrandbits(64) for _ in range(4)] for _ in range(32)]
-        self.z_black_turn = random.getrandbits(64)
-        # 33 positions for forced attack: 0-31 for board indices, 32 for value -1 (no forced move)
-        self.z_forced_pos = [random.getrandbits(64) for _ in range(33)]
+    def reset_progress(self):
+        # what other threads read or set while a search runs
+        self.nodes = 0
+        self.completed_depth = 0
+        self.stopped = False
 
-        self.piece_map = {Color.WHITE.value[0]: 0, Color.WHITE.value[1]: 1, Color.BLACK.value[0]: 2, Color.BLACK.value[1]: 3}
+    def start_search(self, time_ms: float | None = None, reset: bool = True):
+        # reset=False: the caller already called reset_progress (see start_thread)
+        self.memory.new_search()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # older history still hints at good moves, but should not outweigh the new search
+        self.history = [value // 2 for value in self.history]
+        if reset:
+            self.reset_progress()
+        self.deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000
+        if self.collect_stats:
+            self.stats = SearchStats()
+            self.stats.start(self.memory)
+    
+    def search(self, game: Checkers, time_ms: float | None = None, max_depth: int = Difficulty.HARD.value,
+               reset: bool = True) -> tuple[float, tuple | None]:
+        # iterative deepening: depth 1, 2, ... until max_depth or the time budget runs out,
+        # the result of the deepest completed iteration is returned (depth 1 always completes)
+        self.start_search(time_ms, reset)
+        if self.book is not None:
+            entry = self.book_move(game)
+            if entry is not None:
+                return entry
+        self.searching = True
+        result = (self.evaluate(game), None)
+        try:
+            for depth in range(1, max_depth + 1):
+                iteration_start = self.nodes
+                if self.pvs and depth > 1 and abs(result[0]) != math.inf:
+                    alpha, beta = result[0] - ASPIRATION_WINDOW, result[0] + ASPIRATION_WINDOW
+                    score, move = self.minmax(game, depth, alpha, beta)
+                    if not self.stopped and not alpha < score < beta:
+                        score, move = self.minmax(game, depth)
+                else:
+                    score, move = self.minmax(game, depth)
+                if self.stopped:
+                    break
+                result = score, move
+                self.completed_depth = depth
+                if self.stats is not None:
+                    self.stats.iteration(self.nodes - iteration_start)
+                if abs(score) == math.inf:
+                    break
+        finally:
+            self.searching = False
+            if self.stats is not None:
+                self.stats.finish(self.nodes, self.completed_depth, self.memory)
+        return result
+    
+    def stop(self):
+        self.stopped = True
+
+    def start_thread(self, game: Checkers, time_ms: float | None = None, max_depth: int = Difficulty.HARD.value,
+                     done: Callable | None = None) -> threading.Thread:
+        """
+        Runs `search` on a copy of the position in a background thread, `done` gets its result.
+
+        The progress is reset before the thread starts, so `stop` works as soon as this returns
+        and `completed_depth` never shows the previous search.
+        """
+        position = game.copy()
+        self.reset_progress()
+
+        def run():
+            result = self.search(position, time_ms, max_depth, reset=False)
+            if done is not None:
+                done(result)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop_thread(self, thread: threading.Thread | None):
+        if thread is not None:
+            self.stop()
+            thread.join()
+    
+    def book_move(self, game: Checkers) -> tuple[float, tuple] | None:
+        # when the book answers, the search statistics started by start_search are closed here
+        entry = self.book.lookup(game)
+        if entry is not None and self.stats is not None:
+            self.stats.finish(self.nodes, 0, self.memory, book=True)
+        return entry
+    
+    def save_memory(self):
+        if self.memory_file is not None:
+            os.makedirs(os.path.dirname(self.memory_file) or ".", exist_ok=True)
+            self.memory.save(self.memory_file, self.memory_tag)
     
     def compute_zobrist_hash(self, game: Checkers):
-        h = 0
-        for position in range(32):
-            piece = game.board[position]
-            if piece != 0:
-                piece_idx = self.piece_map[piece]
-                h ^= self.z_board[position][piece_idx]
+        return Checkers.compute_hash(game)
+    
+    def order_moves(self, game: Checkers, moves: list, tt_move: int, ply: int, captures: bool) -> list:
+        killers = self.killers[ply] if ply < MAX_PLY else [None, None]
         
-        if game.color == Color.BLACK:
-            h ^= self.z_black_turn
-
-        forced_idx = 32 if game.position_forced_by_attack == -1 else game.position_forced_by_attack
-        h ^= self.z_forced_pos[forced_idx]
+        def priority(move: tuple) -> int:
+            history = self.history[move[0] << 5 | move[1][-1]]
+            if tt_move and pack_move(move) == tt_move:
+                return 1 << 40
+            if captures:
+                return sum(abs(game.piece_at(position)) for position in move[2]) << 32 | history
+            if move == killers[0]:
+                return 1 << 31
+            if move == killers[1]:
+                return 1 << 30
+            return history
         
-        return h
+        return sorted(moves, key=priority, reverse=True)
+    
+    def record_cutoff(self, move: tuple, depth: int, ply: int, captures: bool):
+        self.history[move[0] << 5 | move[1][-1]] += depth * depth
+        if not captures and ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply] = [move, self.killers[ply][0]]
     
-    def minmax(self, game: Checkers, depth: int, alpha = -math.inf, beta = math.inf) -> tuple[float, list | None]:
+    def evaluate(self, game: Checkers) -> float:
+        if self.stats is not None:
+            self.stats.leaf_evals += 1
+        if self.incremental_heuristic is not None:
+            return self.incremental_heuristic(game)
+        return self.heuristic(game.board)
+    
+    def evaluate_leaves(self, game: Checkers, moves: list) -> list[float]:
+        leaves = np.empty((len(moves), 32), dtype=np.int8)
+        for i, move in enumerate(moves):
+            undo_record = game.make_move(move, validate=False)
+            leaves[i] = game.board
+            game.unmake_move(undo_record)
+        if self.stats is not None:
+            self.stats.leaf_evals += len(moves)
+        return self.batch_heuristic(leaves).tolist()
+    
+    def quiescence(self, game: Checkers, alpha: float, beta: float, depth: int, ply: int, static: float | None = None) -> tuple[float, tuple | None]:
+        # static: the heuristic value of this position if the parent already computed it
+        if depth < 1:
+            return (self.evaluate(game) if static is None else static), None
+        
+        attacking_moves = game.legal_moves()
+        if not attacking_moves or not attacking_moves[0][2]:
+            return (self.evaluate(game) if static is None else static), None
+        
+        # captures are mandatory, so there is no stand-pat score: the side to move has to take
+        version = -1 if game.color == Color.BLACK else 1
+        minmax_score = -math.inf * version
+        best_move = None
+        if self.ordering:
+            attacking_moves = self.order_moves(game, attacking_moves, 0, ply, True)
+        
+        for move in attacking_moves:
+            undo_record = game.make_move(move, validate=False)
+            self.nodes += 1
+            
+            score, _ = self.quiescence(game, alpha, beta, depth - 1, ply + 1)
+            game.unmake_move(undo_record)
+            
+            if best_move is None or score * version > minmax_score * version:
+                minmax_score = score
+                best_move = move
+            
+            if version == 1:
+                alpha = max(alpha, minmax_score)
+            else:
+                beta = min(beta, minmax_score)
+            if alpha >= beta:
+                break
+        
+        return minmax_score, best_move
+    
+    def minmax(self, game: Checkers, depth: int, alpha = -math.inf, beta = math.inf, ply = 0, static: float | None = None) -> tuple[float, tuple | None]:
+        if ply == 0 and not self.searching:
+            self.start_search()
+            if self.book is not None:
+                entry = self.book_move(game)
+                if entry is not None:
+                    return entry
+            if self.stats is not None:
+                # a single search outside search(): the statistics are closed when it returns
+                self.searching = True
+                try:
+                    return self.minmax(game, depth, alpha, beta)
+                finally:
+                    self.searching = False
+                    self.stats.finish(self.nodes, depth, self.memory)
+        if ply == 0 and self.prepare is not None:
+            self.prepare(game)
+        self.nodes += 1
+        if self.deadline is not None and self.completed_depth and self.nodes & 15 == 0 and time.perf_counter() > self.deadline:
+            self.stopped = True
+        if self.stopped:
+            return 0, None
+        if self.stats is not None:
+            if depth >= 1:
+                self.stats.interior_nodes += 1
+            else:
+                self.stats.horizon_nodes += 1
         alpha_orig = alpha
         beta_orig = beta
-        board_hash = self.compute_zobrist_hash(game)
+        board_hash = game.hash
+        if self.debug_hash:
+            assert board_hash == self.compute_zobrist_hash(game), "incremental zobrist hash is out of sync"
+        if (self.tablebase is not None and ply > 0 and game.position_forced_by_attack == -1
+                and self.tablebase.covers(game)):
+            return self.tablebase.probe(board_hash, ply), None
         
-        if board_hash in self.memory:
-            stored_depth, stored_score, stored_move, flag = self.memory[board_hash]
+        entry = self.memory.probe(board_hash)
+        tt_move = 0
+        if entry is not None:
+            stored_depth, stored_score, stored_move, flag = entry
+            stored_score = score_from_memory(stored_score, ply)
+            tt_move = stored_move
             if stored_depth >= depth:
-                if flag == 'EXACT':
-                    return stored_score, stored_move
-                elif flag == 'LOWER':
+                if flag == EXACT:
+                    if self.stats is not None:
+                        self.stats.tt_cutoffs += 1
+                    return stored_score, find_packed_move(game, stored_move) if ply == 0 else None
+                elif flag == LOWER:
                     alpha = max(alpha, stored_score)
-                elif flag == 'UPPER':
+                elif flag == UPPER:
                     beta = min(beta, stored_score)
                 
                 if alpha >= beta:
-                    return stored_score, stored_move
+                    if self.stats is not None:
+                        self.stats.tt_cutoffs += 1
+                    return stored_score, find_packed_move(game, stored_move) if ply == 0 else None
                 
                 
         if depth < 1:   
-            return self.heuristic(game.board), None
+            return self.quiescence(game, alpha, beta, self.quiescence_depth, ply, static)
         
-        normal_moves, attacking_moves = game.possible_moves()
-        possible_moves = attacking_moves if attacking_moves else normal_moves
+        possible_moves = game.legal_moves()
+        captures = bool(possible_moves) and bool(possible_moves[0][2])
+        if captures and self.stats is not None:
+            self.stats.max_jump = max(self.stats.max_jump, max(len(move[2]) for move in possible_moves))
 
         version = -1 if game.color == Color.BLACK else 1
         
@@ -425,41 +1017,55 @@ class Algorithm:
         best_move = None
         
         if not possible_moves:
-            return self.heuristic(game.board), None
+            return self.evaluate(game), None
         
-        for [position, direction, distance] in possible_moves:
-            board_copy = game.board[:]
-            game_to_check = Checkers(board_copy, game.color, game.position_forced_by_attack)
-            try:
-                is_turn_finished = game_to_check.turn(position, direction, distance)
-                
-                if is_turn_finished:
-                    score, _ = self.minmax(game_to_check, depth - 1, alpha, beta)
-                else:
-                    score, _ = self.minmax(game_to_check, depth, alpha, beta)
+        if self.ordering:
+            possible_moves = self.order_moves(game, possible_moves, tt_move, ply, captures)
+        
+        statics = [None] * len(possible_moves)
+        if depth == 1 and self.batch_heuristic is not None:
+            statics = self.evaluate_leaves(game, possible_moves)
+        
+        for index, (move, static) in enumerate(zip(possible_moves, statics)):
+            undo_record = game.make_move(move, validate=False)
             
-                if score * version >= minmax_score * version:
-                        minmax_score = score
-                        best_move = [position, direction, distance]
-                
+            if self.pvs and best_move is not None:
+                # prove the move is no better than the current best with a null window, re-search if it is
                 if version == 1:
-                    alpha = max(alpha, minmax_score)
-                    if alpha >= beta:
-                        break
+                    score, _ = self.minmax(game, depth - 1, alpha, math.nextafter(alpha, math.inf), ply + 1, static)
                 else:
-                    beta = min(beta, minmax_score)
-                    if beta <= alpha:
-                        break
-                    
-            except Exception:
-                continue
+                    score, _ = self.minmax(game, depth - 1, math.nextafter(beta, -math.inf), beta, ply + 1, static)
+                if alpha < score < beta and not self.stopped:
+                    score, _ = self.minmax(game, depth - 1, alpha, beta, ply + 1, static)
+            else:
+                score, _ = self.minmax(game, depth - 1, alpha, beta, ply + 1, static)
+            game.unmake_move(undo_record)
+            if self.stopped:
+                return minmax_score, best_move
+        
+            # only a strictly better score replaces the best move: a later move that merely ties
+            # a bound may be worse than it looks, and it must not push out the ordered first move
+            if best_move is None or score * version > minmax_score * version:
+                    minmax_score = score
+                    best_move = move
+            
+            if version == 1:
+                alpha = max(alpha, minmax_score)
+            else:
+                beta = min(beta, minmax_score)
+            if alpha >= beta:
+                if self.ordering:
+                    self.record_cutoff(move, depth, ply, captures)
+                if self.stats is not None:
+                    self.stats.cutoff(index)
+                break
         
-        tt_flag = 'EXACT'
+        tt_flag = EXACT
         if minmax_score <= alpha_orig:
-            tt_flag = 'UPPER'
+            tt_flag = UPPER
         elif minmax_score >= beta_orig:
-            tt_flag = 'LOWER'
+            tt_flag = LOWER
             
-        self.memory[board_hash] = (depth, minmax_score, best_move, tt_flag)
+        self.memory.store(board_hash, depth, score_to_memory(minmax_score, ply), pack_move(best_move), tt_flag)
         
         return minmax_score, best_move
\ No newline at end of file
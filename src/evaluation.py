@@ -0,0 +1,92 @@
+import math
+import numpy as np
+from classes import ADVANCE_BLACK, ADVANCE_WHITE, ADVANCEMENT_REPEATS, Checkers, Heuristics, K_VALUE
+
+
+class TableHeuristic:
+    """
+    Heuristic defined as data: material plus `weight` times an integer pattern score.
+
+    The pattern score adds `squares[piece][position]` for every piece on the board and
+    `pair_weight` for every white doubling pair (minus for every black one). The terms are
+    integers scaled once by the weight, like in `Heuristics`, so the scalar, batched and
+    incremental scores are identical. Instances hold plain lists and pickle by value.
+    """
+    def __init__(self, name: str, weight: float, squares: dict[int, list[int]], pair_weight: int = 0):
+        self.__name__ = name
+        self.weight = weight
+        self.pair_weight = pair_weight
+        # one row per piece value from -K_VALUE to K_VALUE, empty squares and unused values score 0
+        self.table = [[0]*32 for _ in range(2*K_VALUE + 1)]
+        for piece, row in squares.items():
+            self.table[piece + K_VALUE] = list(row)
+        self.array = np.array(self.table)
+
+    def __call__(self, board: list[int]) -> float:
+        if not any(piece < 0 for piece in board):
+            return math.inf
+        if not any(piece > 0 for piece in board):
+            return -math.inf
+        table = self.table
+        terms = sum(table[piece + K_VALUE][position] for position, piece in enumerate(board) if piece)
+        if self.pair_weight:
+            terms += self.pair_weight * Heuristics.doubling_pairs(board)
+        return sum(board) + self.weight * terms
+
+    def prepare(self, game: Checkers):
+        game.track_table(self.table)
+
+    def incremental(self, game: Checkers) -> float:
+        if game.black_pieces == 0:
+            return math.inf
+        if game.white_pieces == 0:
+            return -math.inf
+        terms = game.square_sums[game.track_table(self.table)] + self.pair_weight * game.pairs
+        return game.material + self.weight * terms
+
+    def batch(self, boards: np.ndarray) -> np.ndarray:
+        terms = self.array[boards.astype(np.intp) + K_VALUE, np.arange(32)].sum(axis=1)
+        if self.pair_weight:
+            terms = terms + self.pair_weight * Heuristics.batch_doubling_pairs(boards)
+        scores = boards.sum(axis=1, dtype=np.int64) + self.weight * terms
+        return Heuristics.batch_terminal(boards, scores)
+
+
+def white_and_black(white: list[int], black: list[int]) -> dict[int, list[int]]:
+    # the same row for men and kings of a colour, black entries count against white
+    return {1: white, K_VALUE: white, -1: [-value for value in black], -K_VALUE: [-value for value in black]}
+
+
+def sum_score(weight: float) -> TableHeuristic:
+    return TableHeuristic("sum_score", weight, {})
+
+
+def sum_and_backline(weight: float) -> TableHeuristic:
+    home = [0]*28 + [1]*4
+    return TableHeuristic("sum_and_backline", weight, white_and_black(home, home[::-1]))
+
+
+def sum_and_doubling(weight: float) -> TableHeuristic:
+    return TableHeuristic("sum_and_doubling", weight, {}, pair_weight=1)
+
+
+def doubling_aggresive(weight: float) -> TableHeuristic:
+    # the advancement rows have always counted once per DOWN_R doubling pair
+    white = [ADVANCEMENT_REPEATS * rows for rows in ADVANCE_WHITE]
+    black = [ADVANCEMENT_REPEATS * rows for rows in ADVANCE_BLACK]
+    return TableHeuristic("doubling_aggresive", weight, white_and_black(white, black), pair_weight=1)
+
+
+TABLE_HEURISTICS = {
+    "sum_score": sum_score,
+    "sum_and_backline": sum_and_backline,
+    "sum_and_doubling": sum_and_doubling,
+    "doubling_aggresive": doubling_aggresive,
+}
+
+
+def heuristic_by_name(name: str, weight: float = 0.3):
+    # table version when there is one, the Heuristics method otherwise (random_score)
+    if name in TABLE_HEURISTICS:
+        return TABLE_HEURISTICS[name](weight)
+    return Heuristics.by_name(name, weight)
@@ -1,6 +1,12 @@
 import sys
 import pygame
-from classes import Checkers, Color, Direction, Heuristics, Algorithm, K_VALUE, Difficulty
+from classes import Checkers, Color, Direction, Heuristics, Algorithm, K_VALUE, Difficulty, RAYS, QUIESCENCE_DEPTH
+from tablebase import load_tablebase
+from book import load_book
+from ponder import Ponderer
+
+BOT_TIME_MS = 2000  # per-move budget, the difficulty only caps the search depth
+MEMORY_DIR = "memory"  # the bot's transposition table is kept here between sessions
 
 def get_row_col_from_index(index: int) -> tuple[int,int]:
     row = index // 4
@@ -9,28 +15,12 @@ def get_row_col_from_index(index: int) -> tuple[int,int]:
     return row, col
 
 def calculate_move_params(start_index: int, end_index: int) -> tuple[Direction | None, int | None]:
-    r0, c0 = get_row_col_from_index(start_index)
-    r1, c1 = get_row_col_from_index(end_index)
-    
-    dy = r1 - r0
-    dx = c1 - c0
-    
-    distance = abs(dy)
-    
-    if distance == 0 or abs(dx) != distance:
-        return None, None 
+    for direction in Direction:
+        ray = RAYS[direction][start_index]
+        if end_index in ray:
+            return direction, ray.index(end_index) + 1
     
-    direction = None
-    if dy < 0 and dx < 0:
-        direction = Direction.UP_L
-    elif dy < 0 and dx > 0:
-        direction = Direction.UP_R
-    elif dy > 0 and dx < 0:
-        direction = Direction.DOWN_L
-    elif dy > 0 and dx > 0:
-        direction = Direction.DOWN_R
-        
-    return direction, distance
+    return None, None
 
 class CheckersUI:
     def __init__(self, PLAYER_COLOR_STR: str = 'w') -> None:
@@ -70,11 +60,23 @@ class CheckersUI:
 
         self.game = Checkers()
         heuristic = Heuristics(0.3)
-        self.bot_algo = Algorithm(heuristic.doubling_aggresive) 
+        # the endgame tablebase and the opening book are used when they have been generated
+        # (python tablebase.py, python book.py)
+        self.bot_algo = Algorithm(heuristic.doubling_aggresive, quiescence_depth=QUIESCENCE_DEPTH,
+                                  tablebase=load_tablebase(), book=load_book(heuristic=heuristic.doubling_aggresive),
+                                  memory_dir=MEMORY_DIR, stats=True)
         
         
         self.bot_depth = Difficulty.MEDIUM.value
         self.game_state = "MENU" 
+        # while the player thinks the bot searches the position, its own search then mostly reads the table
+        self.ponderer = Ponderer(self.bot_algo, self.bot_depth)
+
+        # the bot searches a copy of the game in a background thread, the event loop polls it
+        self.bot_thread = None
+        self.bot_result = None
+        self.bot_paused = False
+        self.force_move = False
 
         self.user_text = ""
         self.status_message = "Enter move (e.g. 9.13):"
@@ -214,34 +216,80 @@ class CheckersUI:
             self.status_message = str(e)
             self.status_color = self.ERROR_COLOR
 
-    def process_bot_move(self) -> None:
-        self.draw_board()
-        self.draw_pieces()
-        self.draw_ui_panel()
-        pygame.display.flip()
-        
-        print(f"Bot is thinking (Depth {self.bot_depth})...")
-        
-        _, move = self.bot_algo.minmax(self.game, self.bot_depth)
+    def start_bot_search(self) -> None:
+        self.bot_result = None
+
+        def done(result):
+            self.bot_result = result
+
+        print(f"Bot is thinking (Depth {self.bot_depth})... F: move now, Esc: cancel")
+        self.bot_thread = self.bot_algo.start_thread(self.game, BOT_TIME_MS, self.bot_depth, done)
+
+    def stop_bot_search(self) -> None:
+        self.bot_algo.stop_thread(self.bot_thread)
+        self.bot_thread = None
+
+    def update_bot(self) -> None:
+        if self.bot_paused:
+            return
+
+        if self.bot_thread is None:
+            self.ponderer.stop()
+            if not self.game.legal_moves():
+                self.status_message = "Bot cannot move! You win."
+                self.status_color = self.GOLD
+                return
+            self.start_bot_search()
+
+        if self.bot_thread.is_alive():
+            # a forced move still waits for depth 1, the only iteration that is sure to give a move
+            if self.force_move and self.bot_algo.completed_depth >= 1:
+                self.bot_algo.stop()
+            self.status_message = f"Thinking d{self.bot_algo.completed_depth + 1} {self.bot_algo.nodes}"
+            self.status_color = self.INFO_COLOR
+            return
+
+        self.bot_thread = None
+        self.force_move = False
+        if self.bot_result is None:
+            # the search raised (its traceback is on the console); F tries again
+            self.bot_paused = True
+            self.status_message = "Bot search failed. F: retry"
+            self.status_color = self.ERROR_COLOR
+            return
+        self.process_bot_move(self.bot_result[1])
+
+    def handle_bot_key(self, event: pygame.event.Event) -> None:
+        if event.key == pygame.K_f:
+            # after Esc, F only resumes the search; while it runs, F makes the bot move now
+            if self.bot_paused:
+                self.bot_paused = False
+            else:
+                self.force_move = True
+        elif event.key == pygame.K_ESCAPE and self.bot_thread is not None:
+            self.stop_bot_search()
+            self.bot_paused = True
+            self.force_move = False
+            self.status_message = "Bot paused. F: resume"
+            self.status_color = self.INFO_COLOR
+
+    def process_bot_move(self, move: tuple | None) -> None:
+        print(f"Bot search: {self.bot_algo.stats}")
         
         if move is None:
             self.status_message = "Bot cannot move! You win."
             self.status_color = self.GOLD
             return
 
-        position, direction, distance = move
-        
         try:
-            turn_finished = self.game.turn(position, direction, distance)
+            self.game.make_move(move, validate=False)
             
-            end_pos = self.game.position_after_movement(position, direction, distance)
+            position, landings, _ = move
+            path = ".".join(map(str, (position,) + landings))
             
-            print(f"Bot moved: {position} to {end_pos}")
-            self.status_message = f"Bot: {position}.{end_pos}"
+            print(f"Bot moved: {path}")
+            self.status_message = f"Bot: {path}"
             self.status_color = self.INFO_COLOR
-            
-            if not turn_finished:
-                pass
                 
         except Exception as e:
             print(f"Bot Error: {e}")
@@ -271,35 +319,41 @@ class CheckersUI:
                 self.CLOCK.tick(30)
                 continue
 
-            if self.game.color == self.BOT_COLOR:
-                pygame.time.delay(500)
-                self.process_bot_move()
+            if self.game.color == self.BOT_COLOR and self.game.is_won() is None:
+                self.update_bot()
+            elif self.game.color == self.PLAYER_COLOR and self.game.is_won() is None:
+                self.ponderer.depth = self.bot_depth
+                self.ponderer.ponder(self.game)
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
 
-                if self.game.color == self.PLAYER_COLOR:
-                    if event.type == pygame.KEYDOWN:
+                if event.type == pygame.KEYDOWN:
+                    if self.game.color == self.PLAYER_COLOR:
                         self.handle_input(event)
+                    else:
+                        self.handle_bot_key(event)
 
             self.draw_board()
             self.draw_pieces()
             self.draw_ui_panel()
 
-            white_exists = any(p > 0 for p in self.game.board)
-            black_exists = any(p < 0 for p in self.game.board)
+            winner = self.game.is_won()
             
-            if not white_exists:
+            if winner == Color.BLACK:
                 self.status_message = "BLACK WINS!"
                 self.status_color = self.GOLD
-            elif not black_exists:
+            elif winner == Color.WHITE:
                 self.status_message = "WHITE WINS!"
                 self.status_color = self.GOLD
 
             pygame.display.flip()
             self.CLOCK.tick(60)
 
+        self.ponderer.stop()
+        self.stop_bot_search()
+        self.bot_algo.save_memory()
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,77 @@
+import math
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from classes import Algorithm, Checkers, Color
+from transposition import DEFAULT_SIZE_MB
+
+
+def search_root_move(game: Checkers, move: tuple, depth: int, alpha: float, beta: float,
+                     heuristic: Callable[[list[int]], float], memory_mb: float, ordering: bool,
+                     pvs: bool, quiescence_depth: int) -> tuple[float, int]:
+    # runs in a worker process: a fresh search below one root move, so the result does not
+    # depend on which jobs the worker happened to run before
+    algo = Algorithm(heuristic, memory_mb=memory_mb, ordering=ordering, pvs=pvs, quiescence_depth=quiescence_depth)
+    if algo.prepare is not None:
+        algo.prepare(game)
+    game.make_move(move, validate=False)
+    score, _ = algo.minmax(game, depth - 1, alpha, beta, ply=1)
+    return score, algo.nodes
+
+
+class ParallelSearch:
+    """
+    Fixed-depth minmax with the root moves split across a process pool.
+
+    The first root move (in the order the sequential search would try it) is searched
+    alone to get a bound, the remaining ones are then searched in parallel against that
+    bound. Of the moves that beat the bound the first one with the best score wins, which
+    is the move a fresh sequential `Algorithm.minmax` picks at the same depth.
+    """
+    def __init__(self, heuristic: Callable[[list[int]], float], workers: int | None = None,
+                 memory_mb: float = DEFAULT_SIZE_MB, ordering: bool = True, pvs: bool = False, quiescence_depth: int = 0):
+        self.heuristic = heuristic
+        self.workers = workers or os.cpu_count()
+        self.options = (heuristic, memory_mb, ordering, pvs, quiescence_depth)
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.nodes = 0
+
+    def __enter__(self) -> 'ParallelSearch':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def minmax(self, game: Checkers, depth: int) -> tuple[float, tuple | None]:
+        # the workers start every search from scratch, so the root does as well
+        heuristic, memory_mb, ordering, pvs, quiescence_depth = self.options
+        algo = Algorithm(heuristic, memory_mb=memory_mb, ordering=ordering, pvs=pvs, quiescence_depth=quiescence_depth)
+        moves = game.legal_moves()
+        if depth < 2 or len(moves) < 2:
+            score, move = algo.minmax(game, depth)
+            self.nodes = algo.nodes
+            return score, move
+
+        if ordering:
+            moves = algo.order_moves(game, moves, 0, 0, bool(moves[0][2]))
+        version = -1 if game.color == Color.BLACK else 1
+
+        best_score, self.nodes = self.executor.submit(
+            search_root_move, game.copy(), moves[0], depth, -math.inf, math.inf, *self.options).result()
+        best_move = moves[0]
+
+        # a move that does not beat the first one fails low and is never chosen, so the bound is safe
+        alpha, beta = (best_score, math.inf) if version == 1 else (-math.inf, best_score)
+        futures = [self.executor.submit(search_root_move, game.copy(), move, depth, alpha, beta, *self.options)
+                   for move in moves[1:]]
+        for move, future in zip(moves[1:], futures):
+            score, nodes = future.result()
+            self.nodes += nodes
+            if score * version > best_score * version:
+                best_score = score
+                best_move = move
+
+        return best_score, best_move
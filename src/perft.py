@@ -0,0 +1,117 @@
+import argparse
+import time
+from bitboard import BitboardCheckers
+from classes import Checkers, Color, K_VALUE
+
+BACKENDS = {"list": Checkers, "bitboard": BitboardCheckers}
+
+K = K_VALUE
+POSITIONS = {
+    "opening": ([-1]*12 + [0]*8 + [1]*12, Color.WHITE),
+    # 16 plies into a game, both sides still have nine men
+    "midgame": ([-1, -1, -1, -1, 0, -1, 0, -1, 0, 0, -1, 0, 0, 1, 0, -1,
+                 0, 0, -1, 1, 0, 1, 0, 0, 1, 0, 0, 1, 1, 1, 1, 1], Color.WHITE),
+    # two kings and a man a side: long king moves, king multi-jumps, a man close to promotion
+    "ending": ([0, -K, 0, 0, 0, 0, 0, 0, 0, 0, -K, 0, 0, K, 0, 0,
+                0, 0, 0, 0, 0, 0, K, 0, 0, 0, 0, -1, 0, 0, 1, 0], Color.WHITE),
+}
+
+# leaf counts for depth 1, 2, ... of every position, a multi-jump counting as one ply
+# (counted with the original copy-and-turn move generator)
+REFERENCE = {
+    "opening": [7, 49, 302, 1469, 7361, 36768, 179740],
+    "midgame": [10, 66, 362, 2159, 11235, 61315],
+    "ending": [18, 211, 2539, 26495, 306128],
+}
+
+
+def hops(game: Checkers) -> list:
+    # the moves `turn` accepts: captures are mandatory, during a multi-jump only for the jumping piece
+    normal_moves, attacking_moves = game.possible_moves()
+    if game.position_forced_by_attack >= 0:
+        return [move for move in attacking_moves if move[0] == game.position_forced_by_attack]
+    return attacking_moves if attacking_moves else normal_moves
+
+
+def perft(game: Checkers, depth: int) -> int:
+    """
+    Leaf nodes `depth` plies below the position, built from `possible_moves` one hop at a time.
+
+    A jump that leaves the piece able to attack again does not end the turn, the same
+    player then continues the chain within the same ply, as it does through `turn`.
+    """
+    if depth == 0:
+        return 1
+    nodes = 0
+    for position, direction, distance in hops(game):
+        undo_record = game.make_hop(position, direction, distance)
+        if game.position_forced_by_attack >= 0:
+            nodes += perft(game, depth)
+        else:
+            nodes += perft(game, depth - 1)
+        game.unmake_hop(undo_record)
+    return nodes
+
+
+def perft_turn(game: Checkers, depth: int) -> int:
+    # the same count through `turn` itself (validation included) on copies of the position, slower
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in hops(game):
+        child = game.copy()
+        if child.turn(*move):
+            nodes += perft_turn(child, depth - 1)
+        else:
+            nodes += perft_turn(child, depth)
+    return nodes
+
+
+def perft_moves(game: Checkers, depth: int) -> int:
+    # the same count from `legal_moves`, where a whole multi-jump is generated as one move
+    if depth == 0:
+        return 1
+    moves = game.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo_record = game.make_move(move, validate=False)
+        nodes += perft_moves(game, depth - 1)
+        game.unmake_move(undo_record)
+    return nodes
+
+
+COUNTERS = {"hops": perft, "turn": perft_turn, "moves": perft_moves}
+
+
+def run(name: str, depth: int, backend: str = "list", counter: str = "hops") -> bool:
+    board, color = POSITIONS[name]
+    reference = REFERENCE[name]
+    passed = True
+    for current in range(1, depth + 1):
+        game = BACKENDS[backend](board[:], color)
+        start = time.perf_counter()
+        nodes = COUNTERS[counter](game, current)
+        elapsed = time.perf_counter() - start
+        if current <= len(reference):
+            status = "ok" if nodes == reference[current - 1] else f"MISMATCH, expected {reference[current - 1]}"
+            passed = passed and nodes == reference[current - 1]
+        else:
+            status = "no reference"
+        print(f"{name:8} depth {current:2}: {nodes:12,} nodes {elapsed:8.3f}s {nodes / elapsed if elapsed else 0:12,.0f} nps  {status}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts the leaf nodes of the move tree (perft) and checks them")
+    parser.add_argument("--depth", type=int, default=None, help="deepest ply counted (default: all stored references)")
+    parser.add_argument("--position", choices=list(POSITIONS), action="append", help="default: all of them")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="list")
+    parser.add_argument("--counter", choices=list(COUNTERS), default="hops",
+                        help="hops: possible_moves + make_hop, turn: validated turn() calls, moves: legal_moves")
+    args = parser.parse_args()
+    results = [run(name, args.depth or len(REFERENCE[name]), args.backend, args.counter)
+               for name in args.position or POSITIONS]
+    print("all counts match" if all(results) else "perft counts differ from the reference")
+    raise SystemExit(0 if all(results) else 1)
@@ -0,0 +1,35 @@
+from classes import Algorithm, Checkers
+
+
+class Ponderer:
+    """
+    Searches on the opponent's time: while a human thinks about a move, the bot's own
+    `Algorithm` searches the current position in a background thread.
+
+    The search fills the bot's transposition table with the replies to the likely human
+    moves (one ply deeper than the bot searches, so the entries are deep enough for its
+    own search), which then gets most of its results from the table. `stop` has to be
+    called before the algorithm is used for anything else.
+    """
+    def __init__(self, algo: Algorithm, depth: int):
+        self.algo = algo
+        self.depth = depth
+        self.thread = None
+        self.position = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+    def ponder(self, game: Checkers):
+        # restarted only when the position changed, e.g. halfway through a multi-jump
+        if self.running and self.position == game.hash:
+            return
+        self.stop()
+        self.position = game.hash
+        self.thread = self.algo.start_thread(game, None, self.depth + 1)
+
+    def stop(self):
+        self.algo.stop_thread(self.thread)
+        self.thread = None
+        self.position = None
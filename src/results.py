@@ -0,0 +1,100 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+INDEX_SUFFIX = ".index.pkl"
+OUTCOMES = {"BIALE": (1, -1), "CZARNE": (-1, 1), "REMIS": (0, 0)}  # result for (white, black)
+
+_indexes = {}
+
+
+def load_games(path: str = "statistics.json") -> pd.DataFrame:
+    # statistics.json holds a dict of games, the arena log (statistics.jsonl) one game per line
+    with open(path, "r") as file:
+        if path.endswith(".jsonl"):
+            games = [json.loads(line) for line in file if line.strip()]
+        else:
+            games = list(json.load(file).values())
+    columns = ["winner", "turns", "heuristic_white", "heuristic_black", "depth_white", "depth_black"]
+    return pd.DataFrame(games, columns=columns)
+
+
+def build_index(games: pd.DataFrame) -> pd.DataFrame:
+    """
+    Totals per (heuristic, depth, colour, mirror) from a single group-by over both sides of every game.
+
+    `mirror` marks games a heuristic played against itself, so per-heuristic totals can count
+    such games once instead of once per side.
+    """
+    white_result, black_result = np.array(list(OUTCOMES.values())).T
+    outcome = pd.Categorical(games["winner"], categories=list(OUTCOMES)).codes
+    mirror = (games["heuristic_white"] == games["heuristic_black"]).to_numpy()
+    sides = pd.DataFrame({
+        "heuristic": np.concatenate([games["heuristic_white"], games["heuristic_black"]]),
+        "depth": np.concatenate([games["depth_white"], games["depth_black"]]),
+        "colour": np.repeat(["W", "B"], len(games)),
+        "mirror": np.concatenate([mirror, mirror]),
+        "result": np.concatenate([white_result[outcome], black_result[outcome]]),
+        "turns": np.concatenate([games["turns"], games["turns"]]),
+    })
+    sides["wins"] = sides["result"] == 1
+    sides["loses"] = sides["result"] == -1
+    sides["draws"] = sides["result"] == 0
+    sides["win_turns"] = sides["turns"] * sides["wins"]
+    sides["lose_turns"] = sides["turns"] * sides["loses"]
+    sides["draw_turns"] = sides["turns"] * sides["draws"]
+    columns = ["wins", "loses", "draws", "win_turns", "lose_turns", "draw_turns"]
+    return sides.groupby(["heuristic", "depth", "colour", "mirror"])[columns].sum()
+
+
+def load_index(path: str = "statistics.json") -> pd.DataFrame:
+    # the index is rebuilt only when the results file changes, otherwise it comes from memory or the disk cache
+    source = os.stat(path)
+    signature = (source.st_size, source.st_mtime_ns)
+    if path in _indexes and _indexes[path].attrs["source"] == signature:
+        return _indexes[path]
+    cache = path + INDEX_SUFFIX
+    index = None
+    if os.path.exists(cache):
+        index = pd.read_pickle(cache)
+        if index.attrs.get("source") != signature:
+            index = None
+    if index is None:
+        index = build_index(load_games(path))
+        index.attrs["source"] = signature
+        index.to_pickle(cache)
+    _indexes[path] = index
+    return index
+
+
+def summarize(totals: pd.Series, games: int) -> list:
+    # same layout as arena.scrap_data: counts, average game lengths, rates
+    if games == 0:
+        return [0, 0, 0, 0, 0, 0, 0.0, 0.0, 0.0]
+    wins, loses, draws = (int(totals[column]) for column in ("wins", "loses", "draws"))
+    lengths = [totals[column] / count if count > 0 else 0
+               for column, count in (("win_turns", wins), ("lose_turns", loses), ("draw_turns", draws))]
+    return [wins, loses, draws, *lengths, wins / games, loses / games, draws / games]
+
+
+def side_stats(index: pd.DataFrame, colour: str, depth: int, heuristic: str) -> list:
+    # colour "W" or "B": games of `heuristic` playing that colour at that depth
+    rows = index.droplevel("mirror")
+    key = (heuristic, depth, colour)
+    totals = rows.loc[[key]].sum() if key in rows.index else pd.Series(0, index=index.columns)
+    return summarize(totals, int(totals["wins"] + totals["loses"] + totals["draws"]))
+
+
+def heuristic_rates(index: pd.DataFrame) -> dict[str, tuple[float, float, float]]:
+    # win, lose and draw rates over every game a heuristic took part in, mirror games counted once
+    per_side = index.groupby(level=["heuristic", "mirror"]).sum()
+    rates = {}
+    for heuristic, totals in per_side.groupby(level="heuristic"):
+        totals = totals.droplevel("heuristic")
+        mirror = totals.loc[True] if True in totals.index else pd.Series(0, index=index.columns)
+        total = totals.sum()
+        games = (total["wins"] + total["loses"] + total["draws"]) - (mirror["wins"] + mirror["loses"] + mirror["draws"]) / 2
+        draws = total["draws"] - mirror["draws"] / 2
+        rates[heuristic] = (total["wins"] / games, total["loses"] / games, draws / games)
+    return rates
@@ -1,5 +1,6 @@
-from classes import Player, Checkers, Heuristics, Algorithm
+from classes import Player, Checkers, Heuristics, Algorithm, Color
 from collections.abc import Callable
+from ponder import Ponderer
     
 TURNS = 50 
 
@@ -8,39 +9,46 @@ def simulate_game(func1: Callable[[list[int]], float], func2: Callable[[list[int
     player_w, player_b, depth = Player.settings()
     alg_w = Algorithm(func1)
     alg_b = Algorithm(func2)
+    # a bot searches on its human opponent's time
+    ponder_w = Ponderer(alg_w, depth) if player_w == '2' and player_b == '1' else None
+    ponder_b = Ponderer(alg_b, depth) if player_b == '2' and player_w == '1' else None
         
     for _ in range(TURNS):
         # --- White's Turn ---
         if player_w == '1':
+            if ponder_b is not None:
+                ponder_b.ponder(game)
             Player.handle_player(game)
+            if ponder_b is not None:
+                ponder_b.stop()
         else:
-            while True:
-                _, move = alg_w.minmax(game, depth)
-                if move is None:
-                    print("Black won!")
-                    return 2                
-                finished = game.turn(move[0], move[1], move[2])
-                if finished: break
+            _, move = alg_w.minmax(game, depth)
+            if move is None:
+                print("Black won!")
+                return 2
+            game.make_move(move, validate=False)
         
         game.print_board()
-        if not any(piece < 0 for piece in game.board):
+        if game.is_won() == Color.WHITE:
             print("White won!")
             return 1
         
         # --- Black's Turn ---
         if player_b == '1':
+            if ponder_w is not None:
+                ponder_w.ponder(game)
             Player.handle_player(game)
+            if ponder_w is not None:
+                ponder_w.stop()
         else:
-            while True:
-                _, move = alg_b.minmax(game, depth)
-                if move is None:
-                    print("White won!")
-                    return 1
-                finished = game.turn(move[0], move[1], move[2])
-                if finished: break
+            _, move = alg_b.minmax(game, depth)
+            if move is None:
+                print("White won!")
+                return 1
+            game.make_move(move, validate=False)
 
         game.print_board()
-        if not any(piece > 0 for piece in game.board):
+        if game.is_won() == Color.BLACK:
             print("Black won!")
             return 2
             
@@ -0,0 +1,114 @@
+import time
+
+
+class SearchStats:
+    """
+    Counters filled by `Algorithm` while it searches, when it was created with stats=True.
+
+    One object describes one search (`Algorithm.stats` after `minmax` or `search` returns);
+    `add` sums several of them, e.g. all the searches of one side in an arena game.
+    """
+    def __init__(self):
+        self.searches = 0
+        self.book_moves = 0  # moves answered from the opening book, they are not counted as searches
+        self.depth = 0
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        # beta_cutoffs[i]: cutoffs caused by the i-th move tried (0 = the first one, what ordering aims for)
+        self.beta_cutoffs = []
+        self.max_jump = 0  # most pieces taken by one multi-jump seen in the search
+        # effective branching factor N_d / N_(d-1): nodes of the last two iterative deepening iterations.
+        # When the earlier one came from the transposition table (a single node), or the search had one
+        # depth only, the last tree is used instead: all its nodes over the ones with a ply left to search,
+        # the tree a search one ply shallower visits (horizon nodes are where quiescence starts)
+        self.iteration_nodes = []
+        self.interior_nodes = 0
+        self.horizon_nodes = 0
+        self.last_tree = None
+        self.ebf_total = 0.0  # summed over the searches that have one, averaged by branching_factor
+        self.ebf_searches = 0
+        self.elapsed = 0.0
+        self.started = None
+
+    def start(self, memory):
+        self.started = time.perf_counter()
+        self.tt_probes = -memory.probes
+        self.tt_hits = -memory.hits
+
+    def finish(self, nodes: int, depth: int, memory, book: bool = False):
+        self.elapsed = time.perf_counter() - self.started
+        self.searches = 0 if book else 1
+        self.book_moves = 1 if book else 0
+        self.nodes = nodes
+        self.depth = depth
+        self.tt_probes += memory.probes
+        self.tt_hits += memory.hits
+        ebf = self.search_branching_factor()
+        self.ebf_total = ebf or 0.0
+        self.ebf_searches = 1 if ebf else 0
+
+    def iteration(self, nodes: int):
+        # an iterative deepening iteration completed after `nodes` nodes
+        self.iteration_nodes.append(nodes)
+        self.last_tree = self.interior_nodes, self.horizon_nodes
+        self.interior_nodes = 0
+        self.horizon_nodes = 0
+
+    def search_branching_factor(self) -> float | None:
+        if len(self.iteration_nodes) >= 2 and self.iteration_nodes[-2] > 1:
+            return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+        interior, horizon = self.last_tree if self.iteration_nodes else (self.interior_nodes, self.horizon_nodes)
+        # no horizon node: the table answered the whole search, there was no tree
+        return (interior + horizon) / interior if horizon else None
+
+    def cutoff(self, index: int):
+        if index >= len(self.beta_cutoffs):
+            self.beta_cutoffs.extend([0] * (index + 1 - len(self.beta_cutoffs)))
+        self.beta_cutoffs[index] += 1
+
+    def add(self, other: 'SearchStats'):
+        self.searches += other.searches
+        self.book_moves += other.book_moves
+        self.depth = max(self.depth, other.depth)
+        self.nodes += other.nodes
+        self.leaf_evals += other.leaf_evals
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        self.tt_cutoffs += other.tt_cutoffs
+        if len(other.beta_cutoffs) > len(self.beta_cutoffs):
+            self.beta_cutoffs.extend([0] * (len(other.beta_cutoffs) - len(self.beta_cutoffs)))
+        for index, count in enumerate(other.beta_cutoffs):
+            self.beta_cutoffs[index] += count
+        self.max_jump = max(self.max_jump, other.max_jump)
+        self.ebf_total += other.ebf_total
+        self.ebf_searches += other.ebf_searches
+        self.elapsed += other.elapsed
+
+    def branching_factor(self) -> float:
+        # mean effective branching factor of the searches (book moves and single-iteration searches have none)
+        return self.ebf_total / self.ebf_searches if self.ebf_searches else 0.0
+
+    def nps(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def first_move_cutoffs(self) -> float:
+        total = sum(self.beta_cutoffs)
+        return self.beta_cutoffs[0] / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"searches": self.searches, "book_moves": self.book_moves, "depth": self.depth, "nodes": self.nodes,
+                "leaf_evals": self.leaf_evals, "tt_probes": self.tt_probes, "tt_hits": self.tt_hits, "tt_cutoffs": self.tt_cutoffs,
+                "beta_cutoffs": self.beta_cutoffs, "max_jump": self.max_jump, "elapsed": round(self.elapsed, 6),
+                "branching_factor": round(self.branching_factor(), 3), "ebf_searches": self.ebf_searches}
+
+    def __str__(self) -> str:
+        if self.book_moves and not self.searches:
+            return f"opening book move, {self.elapsed:.3f}s"
+        hit_rate = self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+        return (f"depth {self.depth}, {self.nodes} nodes ({self.nps():.0f}/s), {self.leaf_evals} leaf evals, "
+                f"TT {self.tt_hits}/{self.tt_probes} hits ({hit_rate:.0%}), {self.tt_cutoffs} TT cutoffs, "
+                f"{sum(self.beta_cutoffs)} beta cutoffs ({self.first_move_cutoffs():.0%} on the first move), "
+                f"EBF {self.branching_factor():.2f}, longest jump {self.max_jump}, {self.elapsed:.3f}s")
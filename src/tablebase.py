@@ -0,0 +1,173 @@
+import argparse
+import itertools
+import os
+import struct
+import time
+from collections import deque
+import numpy as np
+from bitboard import BitboardCheckers
+from classes import Color, K_VALUE, TB_WIN
+
+DEFAULT_PIECES = 3
+TABLEBASE_FILE = "endgame.tb"
+
+# file layout: header, sorted position hashes (uint64), signed plies to the end + 1 (int16, positive: white wins)
+MAGIC = b"CKTB"
+HEADER = struct.Struct("<4sHHQ")  # magic, version, pieces, entries
+VERSION = 1
+
+
+def positions(pieces: int):
+    # every position with 2..pieces pieces, both sides present, no man standing on its promotion row
+    for count in range(2, pieces + 1):
+        for squares in itertools.combinations(range(32), count):
+            for values in itertools.product((1, K_VALUE, -1, -K_VALUE), repeat=count):
+                if not (any(value > 0 for value in values) and any(value < 0 for value in values)):
+                    continue
+                if any(value == 1 and square <= 3 or value == -1 and square >= 28
+                       for square, value in zip(squares, values)):
+                    continue
+                board = [0]*32
+                for square, value in zip(squares, values):
+                    board[square] = value
+                for color in (Color.WHITE, Color.BLACK):
+                    yield board, color
+
+
+def generate(pieces: int = DEFAULT_PIECES, verbose: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Retrograde analysis over every position with up to `pieces` pieces.
+
+    A side loses when it has no pieces or no legal move, like in the arena. Starting from
+    the lost positions, a position is won in d+1 plies if some move reaches a position lost
+    in d, and lost in d+1 if every move reaches a won one (d being the longest of them).
+    Whatever is never resolved is a draw and is not stored.
+    """
+    start = time.perf_counter()
+    hashes = []
+    white_to_move = []
+    index = {}
+    successors = []
+    wins_now = []
+    for board, color in positions(pieces):
+        game = BitboardCheckers(board, color)
+        index[game.hash] = len(hashes)
+        hashes.append(game.hash)
+        white_to_move.append(color == Color.WHITE)
+        children = []
+        won = False
+        for move in game.legal_moves():
+            undo_record = game.make_move(move, validate=False)
+            if game.is_won() is not None:
+                won = True
+            else:
+                children.append(game.hash)
+            game.unmake_move(undo_record)
+        successors.append(children)
+        wins_now.append(won)
+    if verbose:
+        print(f"{len(hashes):,} positions generated in {time.perf_counter() - start:.1f}s")
+
+    count = len(hashes)
+    predecessors = [[] for _ in range(count)]
+    remaining = [0] * count
+    for parent, children in enumerate(successors):
+        for child in children:
+            predecessors[index[child]].append(parent)
+        remaining[parent] = len(children)
+
+    # plies to the end + 1, positive when the side to move wins, 0 while unresolved
+    result = [0] * count
+    queue = deque()
+    for position in range(count):
+        if wins_now[position]:
+            result[position] = 2  # takes the last enemy piece
+            queue.append(position)
+        elif not successors[position]:
+            result[position] = -1  # no legal move
+            queue.append(position)
+
+    # breadth first, so a win gets its shortest distance and a loss its longest
+    while queue:
+        position = queue.popleft()
+        distance = abs(result[position])
+        for parent in predecessors[position]:
+            if result[parent] != 0:
+                continue
+            if result[position] < 0:
+                result[parent] = distance + 1
+                queue.append(parent)
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    result[parent] = -(distance + 1)
+                    queue.append(parent)
+
+    # stored from white's point of view, draws are left out
+    decisive = [position for position in range(count) if result[position] != 0]
+    keys = np.array([hashes[position] for position in decisive], dtype=np.uint64)
+    values = np.array([result[position] if white_to_move[position] else -result[position] for position in decisive],
+                      dtype=np.int16)
+    order = np.argsort(keys)
+    if verbose:
+        print(f"{len(decisive):,} decisive positions, {count - len(decisive):,} draws, "
+              f"{time.perf_counter() - start:.1f}s in total")
+    return keys[order], values[order]
+
+
+def save(path: str, pieces: int, keys: np.ndarray, values: np.ndarray):
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, pieces, len(keys)))
+        file.write(keys.tobytes())
+        file.write(values.tobytes())
+
+
+class Tablebase:
+    """
+    Read-only endgame tablebase, memory-mapped from a file written by `save`.
+
+    Positions with at most `pieces` pieces that are not in the file are draws.
+    """
+    def __init__(self, path: str = TABLEBASE_FILE):
+        with open(path, "rb") as file:
+            magic, version, self.pieces, entries = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a tablebase file")
+        self.keys = np.memmap(path, dtype=np.uint64, mode="r", offset=HEADER.size, shape=(entries,))
+        self.values = np.memmap(path, dtype=np.int16, mode="r", offset=HEADER.size + 8 * entries, shape=(entries,))
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def covers(self, game) -> bool:
+        # finished games are left to the heuristics
+        return 0 < game.white_pieces and 0 < game.black_pieces and game.white_pieces + game.black_pieces <= self.pieces
+
+    def probe(self, board_hash: int, ply: int = 0) -> float:
+        # score from white's point of view, `ply` moves the win further away so nearer wins are preferred
+        self.probes += 1
+        key = np.uint64(board_hash)
+        position = int(np.searchsorted(self.keys, key))
+        if position == len(self.keys) or self.keys[position] != key:
+            return 0
+        self.hits += 1
+        value = int(self.values[position])
+        # plies to the end are |value| - 1
+        score = TB_WIN - ply - abs(value) + 1
+        return score if value > 0 else -score
+
+
+def load_tablebase(path: str = TABLEBASE_FILE) -> Tablebase | None:
+    return Tablebase(path) if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the endgame tablebase by retrograde analysis")
+    parser.add_argument("--pieces", type=int, default=DEFAULT_PIECES, help="largest number of pieces on the board")
+    parser.add_argument("--output", default=TABLEBASE_FILE)
+    args = parser.parse_args()
+    keys, values = generate(args.pieces)
+    save(args.output, args.pieces, keys, values)
+    print(f"saved {args.output} ({os.path.getsize(args.output):,} bytes)")
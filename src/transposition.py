@@ -0,0 +1,207 @@
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+import numpy as np
+
+EXACT, LOWER, UPPER = 1, 2, 3  # 2-bit flag, 0 marks an empty slot
+DEFAULT_SIZE_MB = 16
+
+# bytes per slot: key check (I), score (d), packed move (Q), depth/flag/generation (H)
+SLOT_BYTES = 4 + 8 + 8 + 2
+SLOTS_PER_BUCKET = 2  # slot 0 keeps the deepest result, slot 1 always takes the newest one
+GENERATIONS = 64
+
+# saved table: header padded to a page (mmap offsets must be page aligned), then the slot arrays
+FILE_MAGIC = b"CKTT"
+FILE_VERSION = 2  # 2: tablebase wins are stored relative to the node
+FILE_HEADER = struct.Struct("<4sHHQQ64s")  # magic, version, generation, capacity, used, tag
+FILE_HEADER_BYTES = mmap.ALLOCATIONGRANULARITY
+LOCK_STALE_S = 60  # a lock file older than this is left over from a crashed process
+
+
+@contextmanager
+def file_lock(path: str):
+    # portable exclusive lock: whoever creates path.lock first holds it
+    lock = path + ".lock"
+    while True:
+        try:
+            descriptor = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > LOCK_STALE_S:
+                    os.remove(lock)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(descriptor)
+        os.remove(lock)
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table stored in packed arrays.
+
+    The low bits of the Zobrist hash select a bucket of two slots and the high 32 bits
+    are kept to verify the match. Slot 0 is depth-preferred (entries from older searches
+    count as free), slot 1 is always replaced.
+    """
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB):
+        buckets = max(1, int(size_mb * 2**20) // (SLOT_BYTES * SLOTS_PER_BUCKET))
+        self.bucket_mask = (1 << buckets.bit_length() - 1) - 1
+        self.capacity = (self.bucket_mask + 1) * SLOTS_PER_BUCKET
+        self.size_mb = self.capacity * SLOT_BYTES / 2**20
+        self.buffer = bytearray(self.capacity * SLOT_BYTES)
+        self._bind(self.buffer)
+        self.generation = 0
+        self.used = 0
+        self.reset_stats()
+
+    def _bind(self, buffer):
+        view = memoryview(buffer)
+        n = self.capacity
+        self.scores = view[:8*n].cast('d')
+        self.moves = view[8*n:16*n].cast('Q')
+        self.keys = view[16*n:20*n].cast('I')
+        self.meta = view[20*n:22*n].cast('H')
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.generation = 0
+        self.used = 0
+        self.reset_stats()
+
+    def new_search(self):
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def probe(self, board_hash: int) -> tuple[int, float, int, int] | None:
+        self.probes += 1
+        index = (board_hash & self.bucket_mask) * SLOTS_PER_BUCKET
+        key = board_hash >> 32
+        meta = self.meta[index]
+        if not meta or self.keys[index] != key:
+            index += 1
+            meta = self.meta[index]
+            if not meta or self.keys[index] != key:
+                return None
+        self.hits += 1
+        return meta >> 8, self.scores[index], self.moves[index], meta & 3
+
+    def store(self, board_hash: int, depth: int, score: float, packed_move: int, flag: int):
+        self.stores += 1
+        slot = (board_hash & self.bucket_mask) * SLOTS_PER_BUCKET
+        key = board_hash >> 32
+        meta = self.meta[slot]
+        if (not meta or self.keys[slot] == key or depth >= meta >> 8
+                or (meta >> 2) & (GENERATIONS - 1) != self.generation):
+            index = slot
+        else:
+            index = slot + 1
+        if not self.meta[index]:
+            self.used += 1
+        self.keys[index] = key
+        self.scores[index] = score
+        self.moves[index] = packed_move
+        self.meta[index] = min(depth, 255) << 8 | self.generation << 2 | flag
+
+    def slot_arrays(self) -> tuple:
+        # NumPy views of the slot arrays (writable, they share the buffer)
+        n = self.capacity
+        return (np.frombuffer(self.buffer, dtype=np.float64, count=n),
+                np.frombuffer(self.buffer, dtype=np.uint64, count=n, offset=8*n),
+                np.frombuffer(self.buffer, dtype=np.uint32, count=n, offset=16*n),
+                np.frombuffer(self.buffer, dtype=np.uint16, count=n, offset=20*n))
+
+    def merge(self, other: 'TranspositionTable'):
+        # slot by slot, an entry of `other` wins over an empty or shallower one of ours
+        scores, moves, keys, meta = self.slot_arrays()
+        other_scores, other_moves, other_keys, other_meta = other.slot_arrays()
+        take = (other_meta != 0) & ((meta == 0) | (other_meta >> 8 > meta >> 8))
+        scores[take] = other_scores[take]
+        moves[take] = other_moves[take]
+        keys[take] = other_keys[take]
+        meta[take] = other_meta[take]
+        self.used = int(np.count_nonzero(meta))
+
+    def save(self, path: str, tag: str = ""):
+        """
+        Merges the table into the file: entries saved there since this table was loaded
+        (e.g. by other arena workers) are kept where they are deeper than ours.
+
+        The file is locked for the read-merge-write and written next to it and renamed
+        over it, so a reader never sees half a table.
+        """
+        with file_lock(path):
+            saved = self.read(path, tag, self.capacity, mapped=False)
+            if saved is not None:
+                self.merge(saved)
+            if isinstance(self.buffer, mmap.mmap):
+                # a mapped file cannot be replaced on Windows: the table moves to memory first
+                mapped = self.buffer
+                self.buffer = bytearray(mapped)
+                self._bind(self.buffer)
+                mapped.close()
+            temp = f"{path}.{os.getpid()}.tmp"
+            with open(temp, "wb") as file:
+                header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, self.generation, self.capacity, self.used, tag.encode())
+                file.write(header.ljust(FILE_HEADER_BYTES, b"\0"))
+                file.write(self.buffer)
+            os.replace(temp, path)
+
+    @classmethod
+    def read(cls, path: str, tag: str, capacity: int, mapped: bool = True) -> 'TranspositionTable | None':
+        # the saved table (mapped copy-on-write, or read into memory), None if missing or saved with another tag or size
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            magic, version, generation, saved_capacity, used, saved_tag = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+            if (magic != FILE_MAGIC or version != FILE_VERSION or saved_capacity != capacity
+                    or saved_tag.rstrip(b"\0") != tag.encode()):
+                return None
+            if mapped:
+                buffer = mmap.mmap(file.fileno(), capacity * SLOT_BYTES, access=mmap.ACCESS_COPY, offset=FILE_HEADER_BYTES)
+            else:
+                file.seek(FILE_HEADER_BYTES)
+                buffer = bytearray(file.read(capacity * SLOT_BYTES))
+        table = cls.__new__(cls)
+        table.bucket_mask = capacity // SLOTS_PER_BUCKET - 1
+        table.capacity = capacity
+        table.size_mb = capacity * SLOT_BYTES / 2**20
+        table.buffer = buffer
+        table._bind(buffer)
+        table.generation = generation
+        table.used = used
+        table.reset_stats()
+        return table
+
+    @classmethod
+    def load(cls, path: str, tag: str = "", size_mb: float = DEFAULT_SIZE_MB) -> 'TranspositionTable':
+        """
+        Table saved by `save`, mapped copy-on-write so only the touched pages are read.
+
+        An empty table is returned when the file is missing or was saved with another tag
+        (entries scored by another evaluation are never mixed in) or another size.
+        """
+        table = cls(size_mb)
+        saved = cls.read(path, tag, table.capacity)
+        return table if saved is None else saved
+
+    def fill(self) -> float:
+        return self.used / self.capacity
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def __len__(self) -> int:
+        return self.used